@@ -0,0 +1,411 @@
+"""
+
+Copyright (c) 2020 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import cocotb_test.simulator
+except ImportError:
+    cocotb_test = None
+
+
+# Shared compile cache for cocotb_test.simulator.run
+#
+# Builds are keyed by the HDL source contents, toplevel, parameters and
+# simulator version, so parametrizations and xdist workers that elaborate
+# the same design share one build.  Set SIM_CACHE=0 to disable.  Only Icarus
+# builds are cached; cocotb-test reruns verilator and make on every Verilator
+# run, so a cached copy would not be reused.
+
+sim_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sim_cache")
+
+tb_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tb")
+
+# test modules import shared cocotb helpers (mac_bench, latency, traffic,
+# wave_window) from tb/ at collection time, in the pytest process
+if tb_dir not in sys.path:
+    sys.path.append(tb_dir)
+
+# checked-in test durations, shared with pytest-split
+durations_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".test_durations")
+
+sim_version_commands = {
+    'icarus': ['iverilog', '-V'],
+}
+
+# simulator executables, for --sim auto
+sim_executables = {
+    'icarus': 'iverilog',
+    'verilator': 'verilator',
+}
+
+# extra compile arguments per simulator, matching the Makefiles
+sim_compile_args = {
+    'verilator': ['-Wno-SELRANGE', '-Wno-WIDTH'],
+}
+
+
+@functools.lru_cache(maxsize=None)
+def sim_version(sim):
+    try:
+        p = subprocess.run(sim_version_commands[sim], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    except OSError:
+        return None
+    lines = p.stdout.splitlines()
+    return lines[0] if lines else None
+
+
+def hash_file(h, path):
+    h.update(os.path.basename(path).encode())
+    with open(path, 'rb') as f:
+        h.update(f.read())
+
+
+def sim_cache_key(sim, version, kwargs):
+    h = hashlib.sha256()
+
+    h.update(json.dumps({
+        'sim': sim,
+        'version': version,
+        'toplevel': kwargs.get('toplevel'),
+        'toplevel_lang': kwargs.get('toplevel_lang', 'verilog'),
+        'parameters': kwargs.get('parameters') or {},
+        'defines': kwargs.get('defines') or [],
+        'compile_args': kwargs.get('compile_args') or [],
+        'verilog_compile_args': kwargs.get('verilog_compile_args') or [],
+        'extra_args': kwargs.get('extra_args') or [],
+        'timescale': kwargs.get('timescale'),
+        'waves': bool(kwargs.get('waves') if kwargs.get('waves') is not None else int(os.getenv("WAVES", 0))),
+    }, sort_keys=True, default=str).encode())
+
+    for src in kwargs['verilog_sources']:
+        hash_file(h, src)
+
+    for inc in kwargs.get('includes') or []:
+        for root, dirs, files in sorted(os.walk(inc)):
+            for name in sorted(files):
+                hash_file(h, os.path.join(root, name))
+
+    return h.hexdigest()[:32]
+
+
+def cached_run(simulator=None, **kwargs):
+    __tracebackhide__ = True
+
+    run = cached_run.run
+
+    sim = os.getenv("SIM") or simulator or "icarus"
+
+    if sim != "icarus":
+        # keep builds for other simulators apart from the icarus build
+        kwargs['sim_build'] = kwargs.get('sim_build', "sim_build") + "-" + sim
+
+    if sim in sim_compile_args:
+        kwargs['compile_args'] = sim_compile_args[sim] + list(kwargs.get('compile_args') or [])
+
+    if (os.getenv("SIM_CACHE", "1") == "0" or sim not in sim_version_commands
+            or kwargs.get('force_compile') or kwargs.get('compile_only')
+            or not isinstance(kwargs.get('verilog_sources'), list)):
+        return run(simulator=simulator, **kwargs)
+
+    version = sim_version(sim)
+    if version is None:
+        return run(simulator=simulator, **kwargs)
+
+    cache = os.path.join(sim_cache_dir, sim_cache_key(sim, version, kwargs))
+    os.makedirs(sim_cache_dir, exist_ok=True)
+
+    # one worker builds, the others wait on the lock and reuse the result
+    with open(cache + ".lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if not os.path.exists(os.path.join(cache, ".done")):
+            shutil.rmtree(cache, ignore_errors=True)
+            run(simulator=simulator, **dict(kwargs, sim_build=cache, compile_only=True))
+            open(os.path.join(cache, ".done"), "w").close()
+
+    # fresh copies are newer than the sources, so the simulator skips compilation
+    sim_build = kwargs.get('sim_build', "sim_build")
+    os.makedirs(sim_build, exist_ok=True)
+
+    for name in os.listdir(cache):
+        path = os.path.join(cache, name)
+        if name != ".done" and not name.endswith("results.xml") and os.path.isfile(path):
+            shutil.copyfile(path, os.path.join(sim_build, name))
+
+    return run(simulator=simulator, **kwargs)
+
+
+# Simulation throughput
+#
+# With --sim-stats=<file>, the tb/sim_stats.py module is loaded ahead of
+# the test module in the simulator.  It records sim time, wall time,
+# Python time, primary clock cycles (sim time over the clock period) and
+# GPI callbacks per cocotb test.
+# The totals for each pytest test are attached as JUnit XML properties
+# and all per-test records are collected into one JSON summary.
+
+sim_stats_summary = None
+current_item = None
+
+sim_stats_properties = ['sim_time_ns', 'wall_time_s', 'python_time_s', 'simulator_time_s', 'clock_cycles_est', 'gpi_callbacks']
+sim_stats_names = set(sim_stats_properties + ['cycles_per_s', 'sim_ns_per_s', 'sim_stats_file'])
+
+
+def sim_stats_totals(tests):
+    totals = {}
+    for name in sim_stats_properties:
+        values = [t[name] for t in tests if t.get(name) is not None]
+        if values:
+            totals[name] = sum(values)
+    if totals.get('wall_time_s'):
+        if 'clock_cycles_est' in totals:
+            totals['cycles_per_s'] = totals['clock_cycles_est'] / totals['wall_time_s']
+        totals['sim_ns_per_s'] = totals['sim_time_ns'] / totals['wall_time_s']
+    return totals
+
+
+def stats_run(simulator=None, **kwargs):
+    __tracebackhide__ = True
+
+    # shared cocotb helpers such as wave_window live in tb/
+    kwargs['python_search'] = list(kwargs.get('python_search') or []) + [tb_dir]
+
+    # PROFILE=1 runs each cocotb test under cProfile, see tb/sim_profile.py
+    if os.getenv("PROFILE", "0") != "0":
+        kwargs['module'] = "sim_profile," + kwargs['module']
+        kwargs['extra_env'] = dict(kwargs.get('extra_env') or {},
+            SIM_PROFILE_DIR=os.path.abspath(os.path.join(kwargs.get('sim_build', "sim_build"), "profile")))
+
+    if sim_stats_summary is None or current_item is None:
+        return cached_run(simulator=simulator, **kwargs)
+
+    stats_file = os.path.abspath(os.path.join(kwargs.get('sim_build', "sim_build"), "sim_stats.json"))
+    if os.path.exists(stats_file):
+        os.remove(stats_file)
+
+    kwargs['module'] = "sim_stats," + kwargs['module']
+    kwargs['extra_env'] = dict(kwargs.get('extra_env') or {}, SIM_STATS_FILE=stats_file)
+
+    try:
+        return cached_run(simulator=simulator, **kwargs)
+    finally:
+        try:
+            with open(stats_file) as f:
+                tests = json.load(f)
+        except (OSError, ValueError):
+            tests = []
+
+        for name, value in sim_stats_totals(tests).items():
+            current_item.user_properties.append((name, value))
+        current_item.user_properties.append(("sim_stats_file", stats_file))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    global current_item
+    current_item = item
+    try:
+        yield
+    finally:
+        current_item = None
+
+
+def write_sim_stats_summary(reports):
+    summary = []
+
+    for nodeid, properties in sorted(reports.items()):
+        properties = dict(properties)
+        entry = {'nodeid': nodeid}
+        entry.update({k: v for k, v in properties.items() if k != "sim_stats_file"})
+        try:
+            with open(properties["sim_stats_file"]) as f:
+                entry['tests'] = json.load(f)
+        except (KeyError, OSError, ValueError):
+            entry['tests'] = []
+        summary.append(entry)
+
+    with open(sim_stats_summary, "w") as f:
+        json.dump(summary, f, indent=2)
+        f.write("\n")
+
+
+# Simulator selection
+#
+# --sim (or SIM) picks the simulator for the whole run.  With --sim auto,
+# tests marked simulator("verilator") run on Verilator when it is
+# installed and everything else runs on Icarus.  --waves (or WAVES=1)
+# enables FST tracing on either simulator.
+
+def pytest_addoption(parser):
+    parser.addoption("--sim", default=os.getenv("SIM", "icarus"),
+        help="simulator: icarus, verilator, or auto for the per-test simulator marker")
+    parser.addoption("--waves", action="store_true", default=False,
+        help="dump FST waveforms")
+    parser.addoption("--sim-stats", default=None, metavar="FILE",
+        help="record simulation throughput per test and write a JSON summary to FILE")
+    parser.addoption("--bench", action="store_true", default=False,
+        help="run benchmark tests")
+    parser.addoption("--update-durations", action="store_true", default=False,
+        help="merge measured test durations into %s" % os.path.basename(durations_file))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "simulator(name): preferred simulator for --sim auto")
+    config.addinivalue_line("markers", "benchmark: performance benchmark, only run with --bench")
+
+    global sim_stats_summary
+    if config.getoption("--sim-stats"):
+        sim_stats_summary = os.path.abspath(config.getoption("--sim-stats"))
+
+    if cocotb_test is not None and not hasattr(cached_run, 'run'):
+        cached_run.run = cocotb_test.simulator.run
+        cocotb_test.simulator.run = stats_run
+
+
+def item_simulator(item):
+    sim = item.config.getoption("--sim")
+
+    if sim == "auto":
+        sim = "icarus"
+        marker = item.get_closest_marker("simulator")
+        if marker is not None and shutil.which(sim_executables.get(marker.args[0], marker.args[0])):
+            sim = marker.args[0]
+
+    return sim
+
+
+def pytest_runtest_setup(item):
+    if item.get_closest_marker("benchmark") is not None and not item.config.getoption("--bench"):
+        pytest.skip("benchmark, run with --bench")
+
+
+@pytest.fixture(autouse=True)
+def simulator(request, monkeypatch):
+    sim = item_simulator(request.node)
+    monkeypatch.setenv("SIM", sim)
+    if request.config.getoption("--waves"):
+        monkeypatch.setenv("WAVES", "1")
+    return sim
+
+
+# Test durations
+#
+# Durations measured on every run are kept in the pytest cache; with
+# --update-durations they are also merged into .test_durations, which
+# pytest-split uses to balance --splits groups across CI jobs.  Tests are
+# ordered longest first from the combined history so that xdist workers
+# do not end the run waiting on one long test picked up last.
+
+measured_durations = None
+measured_sim_stats = None
+
+
+def read_durations_file():
+    try:
+        with open(durations_file) as f:
+            d = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    # pytest-split accepts both a mapping and a list of pairs
+    return d if isinstance(d, dict) else dict(d)
+
+
+def load_durations(config):
+    durations = read_durations_file()
+
+    if getattr(config, 'cache', None) is not None:
+        durations.update(config.cache.get("verilog-ethernet/durations", {}))
+
+    return durations
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    durations = load_durations(config)
+
+    if not durations:
+        return
+
+    # unknown tests count as average, ties keep collection order
+    default = sum(durations.values()) / len(durations)
+    order = {item.nodeid: k for k, item in enumerate(items)}
+    items.sort(key=lambda item: (-durations.get(item.nodeid, default), order[item.nodeid]))
+
+
+def pytest_sessionstart(session):
+    global measured_durations, measured_sim_stats
+
+    # record on the xdist controller, which sees the reports from all workers
+    if not hasattr(session.config, 'workerinput'):
+        measured_durations = {}
+        if sim_stats_summary is not None:
+            measured_sim_stats = {}
+
+
+def pytest_runtest_logreport(report):
+    if measured_durations is not None:
+        measured_durations[report.nodeid] = measured_durations.get(report.nodeid, 0) + report.duration
+    if measured_sim_stats is not None and report.when == "call":
+        properties = [(k, v) for k, v in report.user_properties if k in sim_stats_names]
+        if properties:
+            measured_sim_stats[report.nodeid] = properties
+
+
+def pytest_sessionfinish(session):
+    if measured_sim_stats is not None:
+        write_sim_stats_summary(measured_sim_stats)
+
+    if not measured_durations:
+        return
+
+    config = session.config
+
+    if getattr(config, 'cache', None) is not None:
+        durations = config.cache.get("verilog-ethernet/durations", {})
+        durations.update(measured_durations)
+        config.cache.set("verilog-ethernet/durations", durations)
+
+    if config.getoption("--update-durations"):
+        durations = read_durations_file()
+        durations.update(measured_durations)
+
+        with open(durations_file, "w") as f:
+            json.dump(sorted([k, v] for k, v in durations.items()), f, indent=2)
+            f.write("\n")
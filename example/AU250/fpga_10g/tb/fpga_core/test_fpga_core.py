@@ -28,6 +28,7 @@ import os
 from scapy.layers.l2 import Ether, ARP
 from scapy.layers.inet import IP, UDP
 
+import pytest
 import cocotb_test.simulator
 
 import cocotb
@@ -233,6 +234,7 @@ axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'eth', 'lib', 'axis', 'rtl'
 eth_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'eth', 'rtl'))
 
 
+@pytest.mark.simulator("verilator")
 def test_fpga_core(request):
     dut = "fpga_core"
     module = os.path.splitext(os.path.basename(__file__))[0]
@@ -27,7 +27,9 @@ import os
 
 from scapy.layers.l2 import Ether, ARP
 from scapy.layers.inet import IP, UDP
+from scapy.packet import Raw
 
+import pytest
 import cocotb_test.simulator
 
 import cocotb
@@ -38,6 +40,9 @@ from cocotb.triggers import RisingEdge
 from cocotbext.eth import GmiiFrame, GmiiSource, GmiiSink
 from cocotbext.eth import XgmiiFrame, XgmiiSource, XgmiiSink
 
+import traffic
+from frame_factory import FrameFactory
+
 
 class TB:
     def __init__(self, dut):
@@ -330,6 +335,75 @@ async def run_test(dut):
     await RisingEdge(dut.clk)
 
 
+@cocotb.test(skip=not os.getenv("TRAFFIC"))
+async def run_test_traffic(dut):
+
+    tb = TB(dut)
+
+    await tb.init()
+
+    profile = traffic.TrafficProfile.from_env(traffic.imix(), traffic.Poisson(0.5))
+    tb.log.info("Traffic profile: %s", profile)
+
+    eth = Ether(src='5a:51:52:53:54:55', dst='02:00:00:00:00:00')
+    ip = IP(src='192.168.1.100', dst='192.168.1.128')
+    udp = UDP(sport=5678, dport=1234)
+
+    tb.log.info("resolve ARP")
+
+    test_pkt = eth / ip / udp / bytes(range(32))
+
+    await tb.qsfp1_1_source.send(XgmiiFrame.from_payload(test_pkt.build()))
+
+    rx_frame = await tb.qsfp1_1_sink.recv()
+    rx_pkt = Ether(bytes(rx_frame.get_payload()))
+
+    assert rx_pkt[ARP].op == 1
+
+    resp_pkt = Ether(src=test_pkt.src, dst=test_pkt.dst) / ARP(hwtype=1, ptype=0x0800, hwlen=6, plen=4, op=2,
+        hwsrc=test_pkt.src, psrc=test_pkt[IP].src,
+        hwdst=test_pkt.dst, pdst=test_pkt[IP].dst)
+
+    await tb.qsfp1_1_source.send(XgmiiFrame.from_payload(resp_pkt.build()))
+
+    rx_frame = await tb.qsfp1_1_sink.recv()
+    rx_pkt = Ether(bytes(rx_frame.get_payload()))
+
+    assert rx_pkt[UDP].payload == test_pkt[UDP].payload
+
+    tb.log.info("UDP echo under traffic profile")
+
+    # Ethernet, IPv4 and UDP headers plus FCS
+    frames = profile.frames(64, overhead=14+20+8+4, min_size=64)
+
+    factory = FrameFactory(
+        eth_dest_mac=0x020000000000,
+        eth_src_mac=0x5a5152535455,
+        ip_source_ip=0xc0a80164,
+        ip_dest_ip=0xc0a80180,
+        udp_source_port=5678,
+        udp_dest_port=1234
+    )
+    pkts = factory.generate(len(frames), [len(payload) for payload, gap in frames],
+        payload=lambda k, length: frames[k][0])
+    pkts = [(pkt, gap) for pkt, (payload, gap) in zip(pkts, frames)]
+
+    tx_cr = cocotb.fork(traffic.drive(tb.qsfp1_1_source, pkts, 0.8, XgmiiFrame.from_payload))
+
+    for payload, gap in frames:
+        rx_frame = await tb.qsfp1_1_sink.recv()
+        rx_pkt = Ether(bytes(rx_frame.get_payload()))
+
+        assert rx_pkt[UDP].dport == udp.sport
+        assert rx_pkt[Raw].load == payload
+
+    t = await tx_cr.join()
+    tb.log.info("%d packets echoed, sent in %.1f ns", len(frames), t)
+
+    await RisingEdge(dut.clk)
+    await RisingEdge(dut.clk)
+
+
 # cocotb-test
 
 tests_dir = os.path.abspath(os.path.dirname(__file__))
@@ -339,6 +413,7 @@ axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'eth', 'lib', 'axis', 'rtl'
 eth_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'eth', 'rtl'))
 
 
+@pytest.mark.simulator("verilator")
 def test_fpga_core(request):
     dut = "fpga_core"
     module = os.path.splitext(os.path.basename(__file__))[0]
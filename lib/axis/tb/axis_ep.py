@@ -23,16 +23,45 @@ THE SOFTWARE.
 """
 
 from myhdl import *
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 skip_asserts = False
 
+# sink protocol check levels
+CHECK_OFF = 0
+CHECK_LAST = 1
+CHECK_FULL = 2
+
+# minimum beat count for NumPy batch parsing
+numpy_parse_threshold = 1024
+
+# frames kept by a sink in streaming mode when no maxlen is given
+stream_queue_len = 16
+
 class AXIStreamFrame(object):
+    """
+    AXI stream frame
+
+    Frames constructed from another frame share its data buffer until
+    either side accesses data, at which point the accessing frame takes a
+    private copy.  Buffers that have been handed out through data are
+    always copied.
+    """
+    __slots__ = ('B', 'N', 'M', 'WL', '_data', '_shared', '_exposed', 'keep', 'id', 'dest', 'user', 'last_cycle_user')
+
     def __init__(self, data=b'', keep=None, id=None, dest=None, user=None, last_cycle_user=None):
         self.B = 0
         self.N = 8
         self.M = 1
         self.WL = 8
-        self.data = b''
+        self._data = b''
+        self._shared = False
+        self._exposed = False
         self.keep = None
         self.id = 0
         self.dest = 0
@@ -40,7 +69,12 @@ class AXIStreamFrame(object):
         self.last_cycle_user = None
 
         if type(data) in (bytes, bytearray):
-            self.data = bytearray(data)
+            if type(data) is bytes:
+                # immutable, so it can be shared until written
+                self._data = data
+                self._shared = True
+            else:
+                self._data = bytearray(data)
             self.keep = keep
             self.id = id
             self.dest = dest
@@ -49,10 +83,8 @@ class AXIStreamFrame(object):
         elif type(data) is AXIStreamFrame:
             self.N = data.N
             self.WL = data.WL
-            if type(data.data) is bytearray:
-                self.data = bytearray(data.data)
-            else:
-                self.data = list(data.data)
+            self._data = data._share()
+            self._shared = True
             if data.keep is not None:
                 self.keep = list(data.keep)
             if data.id is not None:
@@ -72,66 +104,125 @@ class AXIStreamFrame(object):
                     self.user = list(data.user)
             self.last_cycle_user = data.last_cycle_user
         else:
-            self.data = list(data)
+            self._data = list(data)
             self.keep = keep
             self.id = id
             self.dest = dest
             self.user = user
             self.last_cycle_user = last_cycle_user
 
+    @property
+    def data(self):
+        if self._shared:
+            # take a private copy before the caller can write to it
+            self._data = self._copy()
+            self._shared = False
+        self._exposed = True
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._shared = False
+        self._exposed = True
+
+    @classmethod
+    def from_buffer(cls, buf):
+        """
+        Frame that takes ownership of buf without copying it
+        """
+        frame = cls()
+        frame._data = buf
+        return frame
+
+    def length(self):
+        return len(self._data)
+
+    def stable_buffer(self):
+        """
+        Internal buffer if nothing outside of the frame can have written to
+        it, otherwise None; lets callers cache values derived from the data
+        """
+        if self._exposed:
+            return None
+        return self._data
+
+    def write_into(self, buf, offset=0):
+        """
+        Copy the frame data into buf at offset without exposing the
+        internal buffer; returns the offset just past the data
+        """
+        end = offset + len(self._data)
+        buf[offset:end] = self._data
+        return end
+
+    def _copy(self):
+        if type(self._data) in (bytes, bytearray):
+            return bytearray(self._data)
+        return list(self._data)
+
+    def _share(self):
+        # buffer for a new frame; a buffer the caller may hold is copied
+        if self._exposed:
+            return self._copy()
+        self._shared = True
+        return self._data
+
     def build(self):
-        if self.data is None:
+        if self._data is None:
             return
 
-        f = list(self.data)
-        tdata = []
-        tkeep = []
-        tid = []
-        tdest = []
-        tuser = []
-        i = 0
-
-        while len(f) > 0:
-            if self.B == 0:
-                data = 0
-                keep = 0
-                for j in range(self.M):
-                    data = data | (f.pop(0) << (j*self.WL))
-                    keep = keep | (1 << j)
-                    if len(f) == 0: break
-                tdata.append(data)
+        f = self._data
 
-                if self.keep is None:
-                    tkeep.append(keep)
-                else:
-                    tkeep.append(self.keep[i])
+        if self.B == 0:
+            M = self.M
+            WL = self.WL
+            if WL == 8 and type(f) in (bytes, bytearray):
+                # byte lanes; pack each beat directly from the buffer
+                v = memoryview(f)
+                tdata = [int.from_bytes(v[k:k+M], 'little') for k in range(0, len(f), M)]
             else:
-                # multiple tdata signals
-                data = 0
-                tdata.append(f.pop(0))
-                tkeep.append(0)
-
-            if self.id is None:
-                tid.append(0)
-            elif type(self.id) is int:
-                tid.append(self.id)
+                tdata = []
+                for k in range(0, len(f), M):
+                    data = 0
+                    for j, w in enumerate(f[k:k+M]):
+                        data = data | (w << (j*WL))
+                    tdata.append(data)
+
+            n = len(tdata)
+
+            if self.keep is None:
+                tkeep = [2**M-1]*n
+                if len(f) % M:
+                    tkeep[-1] = 2**(len(f) % M)-1
             else:
-                tid.append(self.id[i])
+                tkeep = [self.keep[i] for i in range(n)]
+        else:
+            # multiple tdata signals
+            tdata = list(f)
+            n = len(tdata)
+            tkeep = [0]*n
+
+        if self.id is None:
+            tid = [0]*n
+        elif type(self.id) is int:
+            tid = [self.id]*n
+        else:
+            tid = [self.id[i] for i in range(n)]
 
-            if self.dest is None:
-                tdest.append(0)
-            elif type(self.dest) is int:
-                tdest.append(self.dest)
-            else:
-                tdest.append(self.dest[i])
+        if self.dest is None:
+            tdest = [0]*n
+        elif type(self.dest) is int:
+            tdest = [self.dest]*n
+        else:
+            tdest = [self.dest[i] for i in range(n)]
 
-            if self.user is None:
-                tuser.append(0)
-            elif type(self.user) is int:
-                tuser.append(self.user)
-            else:
-                tuser.append(self.user[i])
-            i += 1
+        if self.user is None:
+            tuser = [0]*n
+        elif type(self.user) is int:
+            tuser = [self.user]*n
+        else:
+            tuser = [self.user[i] for i in range(n)]
 
         if self.last_cycle_user:
             tuser[-1] = self.last_cycle_user
@@ -144,40 +235,73 @@ class AXIStreamFrame(object):
         if len(tdata) != len(tkeep) or len(tdata) != len(tid) or len(tdata) != len(tdest) or len(tdata) != len(tuser):
             raise Exception("Invalid data")
 
-        self.data = []
+        data = []
         self.keep = []
         self.id = []
         self.dest = []
         self.user = []
 
-        if self.B == 0:
+        if self.B == 0 and self.WL == 8:
+            data = self.parse_bytes(tdata, tkeep)
+            self.keep = list(tkeep)
+            self.id = list(tid)
+            self.dest = list(tdest)
+            self.user = list(tuser)
+        elif self.B == 0:
             mask = 2**self.WL-1
 
             for i in range(len(tdata)):
                 for j in range(self.M):
                     if tkeep[i] & (1 << j):
-                        self.data.append((tdata[i] >> (j*self.WL)) & mask)
+                        data.append((tdata[i] >> (j*self.WL)) & mask)
                 self.keep.append(tkeep[i])
                 self.id.append(tid[i])
                 self.dest.append(tdest[i])
                 self.user.append(tuser[i])
         else:
             for i in range(len(tdata)):
-                self.data.append(tdata[i])
+                data.append(tdata[i])
                 self.keep.append(tkeep[i])
                 self.id.append(tid[i])
                 self.dest.append(tdest[i])
                 self.user.append(tuser[i])
 
-        if self.WL == 8:
-            self.data = bytearray(self.data)
+        if self.WL == 8 and type(data) is not bytearray:
+            data = bytearray(data)
+
+        # new buffer, not yet visible outside this frame
+        self._data = data
+        self._shared = False
+        self._exposed = False
 
         self.last_cycle_user = self.user[-1]
 
+    def parse_bytes(self, tdata, tkeep):
+        # byte lanes; full beats convert with a single to_bytes call
+        M = self.M
+        full = 2**M-1
+
+        if numpy is not None and 1 < M <= 64 and len(tdata) >= numpy_parse_threshold:
+            d = numpy.frombuffer(b''.join(w.to_bytes(M, 'little') for w in tdata), dtype=numpy.uint8).reshape(-1, M)
+            k = (numpy.array(tkeep, dtype=numpy.uint64).reshape(-1, 1) >> numpy.arange(M, dtype=numpy.uint64)) & 1
+            return bytearray(d[k.astype(bool)].tobytes())
+
+        data = bytearray()
+
+        for w, k in zip(tdata, tkeep):
+            if k == full:
+                data.extend(w.to_bytes(M, 'little'))
+            else:
+                for j in range(M):
+                    if k & (1 << j):
+                        data.append((w >> (j*8)) & 0xff)
+
+        return data
+
     def __eq__(self, other):
         if not isinstance(other, AXIStreamFrame):
             return False
-        if self.data != other.data:
+        if self._data != other._data:
             return False
         if self.keep is not None and other.keep is not None:
             if self.keep != other.keep:
@@ -243,17 +367,63 @@ class AXIStreamFrame(object):
             )
 
     def __iter__(self):
-        return self.data.__iter__()
+        return self._data.__iter__()
+
+
+class IdleSleep(object):
+    """
+    Lets an idle source coroutine sleep until send() is called instead of
+    waking on every clock edge.  send() calls notify(); the coroutine calls
+    wait() from a clock edge, and wait() returns on the clock edge where a
+    polling loop would have seen the frame, or on reset.  wait() polls one
+    more edge to measure the clock period, so a frame sent in the same time
+    step as a clock edge is picked up on that edge, as with polling.
+    """
+    def __init__(self):
+        self.wake = Signal(bool(0))
+        self.pending = False
+
+    def notify(self):
+        self.pending = True
+        self.wake.next = not self.wake
+
+    def wait(self, clk, rst):
+        self.pending = False
+
+        # poll one edge to measure the clock period
+        t = now()
+        yield clk.posedge, rst.posedge
+
+        if rst or self.pending:
+            return
+
+        edge = now()
+        period = edge - t
+
+        # edges only, as callers' waiters are inferred from their own edge yields
+        yield self.wake.posedge, self.wake.negedge, rst.posedge
+
+        if rst:
+            return
+
+        if clk and period and (now() - edge) % period == 0:
+            # send() came in the time step of a clock edge; resume on that edge
+            return
+
+        yield clk.posedge, rst.posedge
 
 
 class AXIStreamSource(object):
-    def __init__(self):
+    def __init__(self, idle_sleep=False):
         self.active = False
         self.has_logic = False
         self.queue = []
+        self.idle_sleep = idle_sleep
+        self.sleep = IdleSleep()
 
     def send(self, frame):
         self.queue.append(AXIStreamFrame(frame))
+        self.sleep.notify()
 
     def write(self, data):
         self.send(data)
@@ -297,6 +467,7 @@ class AXIStreamSource(object):
             id = []
             dest = []
             user = []
+            k = 0
             self.active = False
             B = 0
             N = len(tdata)
@@ -310,8 +481,14 @@ class AXIStreamSource(object):
                 M = 1
                 WL = [1]*B
 
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
 
                 if rst:
                     data = []
@@ -319,7 +496,9 @@ class AXIStreamSource(object):
                     id = []
                     dest = []
                     user = []
+                    k = 0
                     self.active = False
+                    idle = False
                     if B > 0:
                         for s in tdata:
                             s.next = 0
@@ -334,19 +513,20 @@ class AXIStreamSource(object):
                 else:
                     tvalid.next = self.active and (tvalid or not pause)
                     if tready and tvalid:
-                        if len(data) > 0:
+                        if k < len(data):
                             if B > 0:
-                                l = data.pop(0)
+                                l = data[k]
                                 for i in range(B):
                                     tdata[i].next = l[i]
                             else:
-                                tdata.next = data.pop(0)
-                            tkeep.next = keep.pop(0)
-                            tid.next = id.pop(0)
-                            tdest.next = dest.pop(0)
-                            tuser.next = user.pop(0)
+                                tdata.next = data[k]
+                            tkeep.next = keep[k]
+                            tid.next = id[k]
+                            tdest.next = dest[k]
+                            tuser.next = user[k]
                             tvalid.next = not pause
-                            tlast.next = len(data) == 0
+                            k += 1
+                            tlast.next = k == len(data)
                         else:
                             tvalid.next = False
                             tlast.next = False
@@ -361,38 +541,105 @@ class AXIStreamSource(object):
                         if name is not None:
                             print("[%s] Sending frame %s" % (name, repr(frame)))
                         if B > 0:
-                            l = data.pop(0)
+                            l = data[0]
                             for i in range(B):
                                 tdata[i].next = l[i]
                         else:
-                            tdata.next = data.pop(0)
-                        tkeep.next = keep.pop(0)
-                        tid.next = id.pop(0)
-                        tdest.next = dest.pop(0)
-                        tuser.next = user.pop(0)
+                            tdata.next = data[0]
+                        tkeep.next = keep[0]
+                        tid.next = id[0]
+                        tdest.next = dest[0]
+                        tuser.next = user[0]
                         tvalid.next = not pause
-                        tlast.next = len(data) == 0
+                        k = 1
+                        tlast.next = k == len(data)
                         self.active = True
 
+                    idle = not self.active and not self.queue
+
         return instances()
 
 
+class FrameScoreboard(object):
+    """
+    Running counters for a sink in streaming mode.  Each received frame is
+    compared against the next frame from the expected iterator, if any, and
+    then passed to the callback, if any.  Only the most recent mismatches
+    are kept.
+    """
+    def __init__(self, callback=None, expected=None, maxlen=stream_queue_len):
+        self.callback = callback
+        self.expected = iter(expected) if expected is not None else None
+        self.frames = 0
+        self.bytes = 0
+        self.mismatches = 0
+        self.mismatch_log = deque(maxlen=maxlen)
+
+    def receive(self, frame, length):
+        self.frames += 1
+        self.bytes += length
+
+        if self.expected is not None:
+            expected = next(self.expected, None)
+            if expected != frame:
+                self.mismatches += 1
+                self.mismatch_log.append((self.frames-1, expected, frame))
+
+        if self.callback is not None:
+            self.callback(frame)
+
+    def __repr__(self):
+        return 'FrameScoreboard(frames=%d, bytes=%d, mismatches=%d)' % (self.frames, self.bytes, self.mismatches)
+
+
+def tkeep_valid_table(M):
+    """
+    Legal tkeep values for an M lane bus, indexed by [first][last].  tkeep
+    must be nonzero and contiguous, must start in lane 0 unless first, and
+    must end in the highest lane unless last.
+    """
+    full = 2**M-1
+    contiguous = set()
+    for lo in range(M):
+        for hi in range(lo, M):
+            contiguous.add(full >> (M-1-hi) & ~((1 << lo)-1))
+    return [
+        [{full}, {k for k in contiguous if k & 1}],
+        [{k for k in contiguous if k & (1 << M-1)}, contiguous]
+    ]
+
+
 class AXIStreamSink(object):
-    def __init__(self):
+    def __init__(self, check_level=CHECK_FULL, callback=None, expected=None, maxlen=None):
+        self.check_level = check_level
         self.active = False
         self.has_logic = False
-        self.queue = []
+        self.queue = deque()
         self.read_queue = []
         self.sync = Signal(intbv(0))
+        self.scoreboard = FrameScoreboard()
+        if callback is not None or expected is not None or maxlen is not None:
+            self.stream(callback, expected, maxlen)
+
+    def stream(self, callback=None, expected=None, maxlen=None):
+        """
+        Switch to streaming mode: received frames are passed to a
+        FrameScoreboard and only the last maxlen frames are queued.
+        """
+        if maxlen is None:
+            maxlen = stream_queue_len
+        self.scoreboard = FrameScoreboard(callback, expected)
+        self.queue = deque(self.queue, maxlen=maxlen)
+        return self.scoreboard
 
     def recv(self):
         if self.queue:
-            return self.queue.pop(0)
+            return self.queue.popleft()
         return None
 
     def read(self, count=-1):
         while self.queue:
-            self.read_queue.extend(self.queue.pop(0).data)
+            self.read_queue.extend(self.queue.popleft().data)
         if count < 0:
             count = len(self.read_queue)
         data = self.read_queue[:count]
@@ -456,6 +703,7 @@ class AXIStreamSink(object):
             M = len(tkeep)
             WL = int((len(tdata)+M-1)/M)
             first = True
+            tkeep_valid = tkeep_valid_table(M)
 
             if type(tdata) is list or type(tdata) is tuple:
                 # multiple tdata signals
@@ -481,24 +729,11 @@ class AXIStreamSink(object):
 
                     if tvalid_int:
 
-                        if not skip_asserts:
-                            # zero tkeep not allowed
-                            assert int(tkeep) != 0
-                            # tkeep must be contiguous
-                            # i.e. 0b00011110 allowed, but 0b00011010 not allowed
-                            b = int(tkeep)
-                            while b & 1 == 0:
-                                b = b >> 1
-                            while b & 1 == 1:
-                                b = b >> 1
-                            assert b == 0
-                            # tkeep must not have gaps across cycles
-                            if not first:
-                                # not first cycle; lowest bit must be set
-                                assert int(tkeep) & 1
-                            if not tlast:
-                                # not last cycle; highest bit must be set
-                                assert int(tkeep) & (1 << len(tkeep)-1)
+                        check_level = CHECK_OFF if skip_asserts else self.check_level
+
+                        if check_level == CHECK_FULL or (check_level == CHECK_LAST and tlast):
+                            # tkeep must be nonzero and contiguous, with no gaps across cycles
+                            assert int(tkeep) in tkeep_valid[first][bool(tlast)]
 
                         if B > 0:
                             l = []
@@ -521,6 +756,7 @@ class AXIStreamSink(object):
                             frame.WL = WL
                             frame.parse(data, keep, id, dest, user)
                             self.queue.append(frame)
+                            self.scoreboard.receive(frame, frame.length())
                             self.sync.next = not self.sync
                             self.active = False
                             if name is not None:
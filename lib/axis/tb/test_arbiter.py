@@ -25,6 +25,7 @@ THE SOFTWARE.
 
 from myhdl import *
 import os
+import vvp_build
 
 module = 'arbiter'
 testbench = 'test_%s' % module
@@ -35,10 +36,6 @@ srcs.append("../rtl/%s.v" % module)
 srcs.append("../rtl/priority_encoder.v")
 srcs.append("%s.v" % testbench)
 
-src = ' '.join(srcs)
-
-build_cmd = "iverilog -o %s.vvp %s" % (testbench, src)
-
 def bench():
 
     # Parameters
@@ -62,7 +59,7 @@ def bench():
     grant_encoded = Signal(intbv(0)[5:])
 
     # DUT
-    if os.system(build_cmd):
+    if vvp_build.build(testbench, srcs):
         raise Exception("Error running build command")
 
     dut = Cosimulation(
@@ -25,6 +25,7 @@ THE SOFTWARE.
 
 from myhdl import *
 import os
+import vvp_build
 
 import axis_ep
 
@@ -36,10 +37,6 @@ srcs = []
 srcs.append("../rtl/%s.v" % module)
 srcs.append("%s.v" % testbench)
 
-src = ' '.join(srcs)
-
-build_cmd = "iverilog -o %s.vvp %s" % (testbench, src)
-
 def bench():
 
     # Parameters
@@ -119,7 +116,7 @@ def bench():
     )
 
     # DUT
-    if os.system(build_cmd):
+    if vvp_build.build(testbench, srcs):
         raise Exception("Error running build command")
 
     dut = Cosimulation(
@@ -25,6 +25,7 @@ THE SOFTWARE.
 
 from myhdl import *
 import os
+import vvp_build
 
 import axis_ep
 
@@ -38,10 +39,6 @@ srcs.append("../rtl/arbiter.v")
 srcs.append("../rtl/priority_encoder.v")
 srcs.append("%s.v" % testbench)
 
-src = ' '.join(srcs)
-
-build_cmd = "iverilog -o %s.vvp %s" % (testbench, src)
-
 def bench():
 
     # Parameters
@@ -140,7 +137,7 @@ def bench():
     )
 
     # DUT
-    if os.system(build_cmd):
+    if vvp_build.build(testbench, srcs):
         raise Exception("Error running build command")
 
     dut = Cosimulation(
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import argparse
+import ast
+import concurrent.futures
+import glob
+import hashlib
+import os
+import subprocess
+import sys
+
+iverilog = 'iverilog'
+
+def build_cmd(testbench, srcs):
+    return [iverilog, '-o', '%s.vvp' % testbench] + list(srcs)
+
+def build_hash(testbench, srcs, cwd=None):
+    """
+    Hash of the build command and the contents of all sources
+    """
+    h = hashlib.sha256()
+    h.update(' '.join(build_cmd(testbench, srcs)).encode())
+    for src in srcs:
+        with open(os.path.join(cwd or '.', src), 'rb') as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+def up_to_date(testbench, srcs, cwd=None):
+    """
+    True if testbench.vvp exists and was built from the current sources
+    """
+    vvp = os.path.join(cwd or '.', '%s.vvp' % testbench)
+    stamp = vvp + '.sha256'
+
+    try:
+        if os.path.getmtime(vvp) > os.path.getmtime(stamp):
+            # rebuilt by hand since the stamp was written
+            return False
+        with open(stamp) as f:
+            return f.read().strip() == build_hash(testbench, srcs, cwd)
+    except OSError:
+        return False
+
+def build(testbench, srcs, cwd=None, force=False):
+    """
+    Compile testbench.vvp from srcs, skipping the compile when the
+    stamp next to the .vvp matches the content hash of the sources.
+    Returns the iverilog exit status, 0 when skipped.  Set
+    VVP_BUILD_FORCE=1 to always recompile.
+    """
+    force = force or os.getenv('VVP_BUILD_FORCE', '0') != '0'
+
+    if not force and up_to_date(testbench, srcs, cwd):
+        return 0
+
+    stamp = os.path.join(cwd or '.', '%s.vvp.sha256' % testbench)
+
+    try:
+        os.remove(stamp)
+    except OSError:
+        pass
+
+    try:
+        ret = subprocess.call(build_cmd(testbench, srcs), cwd=cwd)
+    except OSError as e:
+        print("Failed to run %s: %s" % (iverilog, e))
+        return 127
+
+    if ret == 0:
+        with open(stamp, 'w') as f:
+            f.write(build_hash(testbench, srcs, cwd)+'\n')
+
+    return ret
+
+def bench_sources(path):
+    """
+    Read testbench and srcs from a legacy bench script without importing it
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+
+    names = {}
+    srcs = []
+
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name == 'srcs':
+                srcs = []
+            elif name in ('module', 'testbench'):
+                value = node.value
+                if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Mod):
+                    names[name] = ast.literal_eval(value.left) % names[value.right.id]
+                else:
+                    names[name] = ast.literal_eval(value)
+        elif (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)
+                and isinstance(node.value.func, ast.Attribute)
+                and isinstance(node.value.func.value, ast.Name)
+                and node.value.func.value.id == 'srcs' and node.value.func.attr == 'append'):
+            arg = node.value.args[0]
+            if isinstance(arg, ast.BinOp) and isinstance(arg.op, ast.Mod):
+                srcs.append(ast.literal_eval(arg.left) % names[arg.right.id])
+            else:
+                srcs.append(ast.literal_eval(arg))
+
+    return names['testbench'], srcs
+
+def build_benches(paths, jobs=None, force=False):
+    """
+    Build several legacy benches in parallel; returns a dict mapping
+    each path to its iverilog exit status
+    """
+    def build_one(path):
+        testbench, srcs = bench_sources(path)
+        return build(testbench, srcs, cwd=os.path.dirname(os.path.abspath(path)), force=force)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        return dict(zip(paths, executor.map(build_one, paths)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Prebuild legacy MyHDL testbenches")
+    parser.add_argument('benches', nargs='*', help="bench scripts (default: test_*.py in the current directory)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="parallel builds (default: CPU count)")
+    parser.add_argument('-f', '--force', action='store_true', help="rebuild even if up to date")
+
+    args = parser.parse_args()
+
+    paths = args.benches or sorted(glob.glob('test_*.py'))
+
+    failed = [path for path, ret in build_benches(paths, args.jobs, args.force).items() if ret]
+
+    for path in failed:
+        print("Build failed: %s" % path)
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
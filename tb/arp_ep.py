@@ -28,6 +28,8 @@ import eth_ep
 import struct
 
 class ARPFrame(object):
+    __slots__ = ('eth_dest_mac', 'eth_src_mac', 'eth_type', 'arp_htype', 'arp_ptype', 'arp_hlen', 'arp_plen', 'arp_oper', 'arp_sha', 'arp_spa', 'arp_tha', 'arp_tpa')
+
     def __init__(self,
                 eth_dest_mac=0,
                 eth_src_mac=0,
@@ -157,14 +159,17 @@ class ARPFrame(object):
 
 
 class ARPFrameSource():
-    def __init__(self):
+    def __init__(self, idle_sleep=False):
         self.active = False
         self.has_logic = False
         self.queue = []
+        self.idle_sleep = idle_sleep
+        self.sleep = axis_ep.IdleSleep()
         self.clk = Signal(bool(0))
 
     def send(self, frame):
         self.queue.append(ARPFrame(frame))
+        self.sleep.notify()
 
     def count(self):
         return len(self.queue)
@@ -210,12 +215,19 @@ class ARPFrameSource():
         def logic():
             frame = dict()
 
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
 
                 if rst:
                     frame_valid.next = False
                     self.active = False
+                    idle = False
                 else:
                     frame_valid.next = self.active and (frame_valid or not pause)
                     if frame_ready and frame_valid:
@@ -242,6 +254,8 @@ class ARPFrameSource():
                         frame_valid.next = not pause
                         self.active = True
 
+                    idle = not self.active and not self.queue
+
         return instances()
 
 
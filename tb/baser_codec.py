@@ -0,0 +1,355 @@
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import xgmii_ep
+
+ETH_PRE = 0x55
+ETH_SFD = 0xD5
+
+XGMII_IDLE   = 0x07
+XGMII_LPI    = 0x06
+XGMII_START  = 0xfb
+XGMII_TERM   = 0xfd
+XGMII_ERROR  = 0xfe
+XGMII_SEQ_OS = 0x9c
+XGMII_RES_0  = 0x1c
+XGMII_RES_1  = 0x3c
+XGMII_RES_2  = 0x7c
+XGMII_RES_3  = 0xbc
+XGMII_RES_4  = 0xdc
+XGMII_RES_5  = 0xf7
+XGMII_SIG_OS = 0x5c
+
+CTRL_IDLE  = 0x00
+CTRL_LPI   = 0x06
+CTRL_ERROR = 0x1e
+CTRL_RES_0 = 0x2d
+CTRL_RES_1 = 0x33
+CTRL_RES_2 = 0x4b
+CTRL_RES_3 = 0x55
+CTRL_RES_4 = 0x66
+CTRL_RES_5 = 0x78
+
+O_SEQ_OS = 0x0
+O_SIG_OS = 0xf
+
+SYNC_DATA = 0b10
+SYNC_CTRL = 0b01
+
+BLOCK_TYPE_CTRL     = 0x1e # C7 C6 C5 C4 C3 C2 C1 C0 BT
+BLOCK_TYPE_OS_4     = 0x2d # D7 D6 D5 O4 C3 C2 C1 C0 BT
+BLOCK_TYPE_START_4  = 0x33 # D7 D6 D5    C3 C2 C1 C0 BT
+BLOCK_TYPE_OS_START = 0x66 # D7 D6 D5    O0 D3 D2 D1 BT
+BLOCK_TYPE_OS_04    = 0x55 # D7 D6 D5 O4 O0 D3 D2 D1 BT
+BLOCK_TYPE_START_0  = 0x78 # D7 D6 D5 D4 D3 D2 D1    BT
+BLOCK_TYPE_OS_0     = 0x4b # C7 C6 C5 C4 O0 D3 D2 D1 BT
+BLOCK_TYPE_TERM_0   = 0x87 # C7 C6 C5 C4 C3 C2 C1    BT
+BLOCK_TYPE_TERM_1   = 0x99 # C7 C6 C5 C4 C3 C2    D0 BT
+BLOCK_TYPE_TERM_2   = 0xaa # C7 C6 C5 C4 C3    D1 D0 BT
+BLOCK_TYPE_TERM_3   = 0xb4 # C7 C6 C5 C4    D2 D1 D0 BT
+BLOCK_TYPE_TERM_4   = 0xcc # C7 C6 C5    D3 D2 D1 D0 BT
+BLOCK_TYPE_TERM_5   = 0xd2 # C7 C6    D4 D3 D2 D1 D0 BT
+BLOCK_TYPE_TERM_6   = 0xe1 # C7    D5 D4 D3 D2 D1 D0 BT
+BLOCK_TYPE_TERM_7   = 0xff #    D6 D5 D4 D3 D2 D1 D0 BT
+
+BLOCK_TYPE_TERM = [
+    BLOCK_TYPE_TERM_0,
+    BLOCK_TYPE_TERM_1,
+    BLOCK_TYPE_TERM_2,
+    BLOCK_TYPE_TERM_3,
+    BLOCK_TYPE_TERM_4,
+    BLOCK_TYPE_TERM_5,
+    BLOCK_TYPE_TERM_6,
+    BLOCK_TYPE_TERM_7
+]
+
+# XGMII control character to 7 bit control code
+XGMII_TO_CTRL = [CTRL_ERROR]*256
+XGMII_TO_CTRL[XGMII_IDLE]  = CTRL_IDLE
+XGMII_TO_CTRL[XGMII_LPI]   = CTRL_LPI
+XGMII_TO_CTRL[XGMII_ERROR] = CTRL_ERROR
+XGMII_TO_CTRL[XGMII_RES_0] = CTRL_RES_0
+XGMII_TO_CTRL[XGMII_RES_1] = CTRL_RES_1
+XGMII_TO_CTRL[XGMII_RES_2] = CTRL_RES_2
+XGMII_TO_CTRL[XGMII_RES_3] = CTRL_RES_3
+XGMII_TO_CTRL[XGMII_RES_4] = CTRL_RES_4
+XGMII_TO_CTRL[XGMII_RES_5] = CTRL_RES_5
+
+# 7 bit control code to XGMII control character
+CTRL_TO_XGMII = [XGMII_ERROR]*128
+CTRL_TO_XGMII[CTRL_IDLE]  = XGMII_IDLE
+CTRL_TO_XGMII[CTRL_LPI]   = XGMII_LPI
+CTRL_TO_XGMII[CTRL_ERROR] = XGMII_ERROR
+CTRL_TO_XGMII[CTRL_RES_0] = XGMII_RES_0
+CTRL_TO_XGMII[CTRL_RES_1] = XGMII_RES_1
+CTRL_TO_XGMII[CTRL_RES_2] = XGMII_RES_2
+CTRL_TO_XGMII[CTRL_RES_3] = XGMII_RES_3
+CTRL_TO_XGMII[CTRL_RES_4] = XGMII_RES_4
+CTRL_TO_XGMII[CTRL_RES_5] = XGMII_RES_5
+
+# 4 bit O code to XGMII ordered set character
+O_TO_XGMII = [XGMII_ERROR]*16
+O_TO_XGMII[O_SEQ_OS] = XGMII_SEQ_OS
+O_TO_XGMII[O_SIG_OS] = XGMII_SIG_OS
+
+# control lane classes for block type selection
+LANE_OTHER = 0
+LANE_START = 1
+LANE_TERM  = 2
+LANE_OS    = 3
+
+XGMII_TO_LANE = [LANE_OTHER]*256
+XGMII_TO_LANE[XGMII_START]  = LANE_START
+XGMII_TO_LANE[XGMII_TERM]   = LANE_TERM
+XGMII_TO_LANE[XGMII_SEQ_OS] = LANE_OS
+XGMII_TO_LANE[XGMII_SIG_OS] = LANE_OS
+
+TERM_LANE = {bt: k for k, bt in enumerate(BLOCK_TYPE_TERM)}
+
+def block_type_term_lane(bt):
+    return TERM_LANE.get(bt)
+
+def _select_block_type(c, first, lane4):
+    # c: control lane mask
+    # first: class of lowest control lane
+    # lane4: class of lane 4 if it is a control lane
+    low = (c & -c).bit_length()-1
+
+    if c == 0x01 and first == LANE_START:
+        # start in lane 0
+        return BLOCK_TYPE_START_0
+    elif c & 0xf0 == 0x10 and lane4 == LANE_START:
+        # start in lane 4
+        if c & 0x0f == 0x01 and first == LANE_OS:
+            # ordered set in lane 0
+            return BLOCK_TYPE_OS_START
+        else:
+            # other control
+            return BLOCK_TYPE_START_4
+    elif c & 0x0f == 0x01 and first == LANE_OS:
+        # ordered set in lane 0
+        if c & 0xf0 == 0x10 and lane4 == LANE_OS:
+            # ordered set in lane 4
+            return BLOCK_TYPE_OS_04
+        else:
+            return BLOCK_TYPE_OS_0
+    elif c & 0xf0 == 0x10 and lane4 == LANE_OS:
+        # ordered set in lane 4
+        return BLOCK_TYPE_OS_4
+    elif first == LANE_TERM:
+        # terminate in lane of lowest control character
+        return BLOCK_TYPE_TERM[low]
+    else:
+        # all control
+        return BLOCK_TYPE_CTRL
+
+# control lane pattern to block type, indexed by c | first << 8 | lane4 << 10
+BLOCK_TYPE_LUT = [None]*4096
+for _k in range(1, 4096):
+    if _k & 0xff:
+        BLOCK_TYPE_LUT[_k] = _select_block_type(_k & 0xff, (_k >> 8) & 3, (_k >> 10) & 3)
+
+# encoder block layout: data mask, data shift, control mask, OS in lane 0, OS in lane 4
+ENC_LAYOUT = {
+    BLOCK_TYPE_CTRL:     (0, 0, 0xffffffffffffff, False, False),
+    BLOCK_TYPE_OS_4:     (0xffffff0000000000, 0, 0x0000000fffffff, False, True),
+    BLOCK_TYPE_START_4:  (0xffffff0000000000, 0, 0x0000000fffffff, False, False),
+    BLOCK_TYPE_OS_START: (0xffffff00ffffff00, 0, 0, True, False),
+    BLOCK_TYPE_OS_04:    (0xffffff00ffffff00, 0, 0, True, True),
+    BLOCK_TYPE_START_0:  (0xffffffffffffff00, 0, 0, False, False),
+    BLOCK_TYPE_OS_0:     (0x00000000ffffff00, 0, 0xfffffff0000000, True, False),
+}
+
+for _k, _bt in enumerate(BLOCK_TYPE_TERM):
+    ENC_LAYOUT[_bt] = (((1 << (_k+1)*8)-1) & ~0xff, 8, 0xffffffffffffff & ~((1 << (_k+1)*7)-1), False, False)
+
+# decoder block layout: rxc, data mask, data shift, control lanes, constant characters, OS in lane 0, OS in lane 4
+DEC_LAYOUT = {
+    BLOCK_TYPE_CTRL:     (0xff, 0, 0, range(0, 8), 0, False, False),
+    BLOCK_TYPE_OS_4:     (0x1f, 0xffffff0000000000, 0, range(0, 4), 0, False, True),
+    BLOCK_TYPE_START_4:  (0x1f, 0xffffff0000000000, 0, range(0, 4), XGMII_START << 32, False, False),
+    BLOCK_TYPE_OS_START: (0x11, 0xffffff00ffffff00, 0, range(0), XGMII_START << 32, True, False),
+    BLOCK_TYPE_OS_04:    (0x11, 0xffffff00ffffff00, 0, range(0), 0, True, True),
+    BLOCK_TYPE_START_0:  (0x01, 0xffffffffffffff00, 0, range(0), XGMII_START, False, False),
+    BLOCK_TYPE_OS_0:     (0xf1, 0x00000000ffffff00, 0, range(4, 8), 0, True, False),
+}
+
+for _k, _bt in enumerate(BLOCK_TYPE_TERM):
+    DEC_LAYOUT[_bt] = (0xff & ~((1 << _k)-1), (1 << _k*8)-1, 8, range(_k+1, 8), XGMII_TERM << _k*8, False, False)
+
+def encode_block(d, c):
+    """
+    Encode one 64 bit XGMII transfer (d: 8 data lanes, c: 8 bit control
+    mask, lane 0 in the LSB) into a 64b66b block.  Returns (header, data).
+    """
+    if not c:
+        return SYNC_DATA, d
+
+    first = XGMII_TO_LANE[(d >> ((c & -c).bit_length()-1)*8) & 0xff]
+    lane4 = XGMII_TO_LANE[(d >> 32) & 0xff] if c & 0x10 else LANE_OTHER
+    bt = BLOCK_TYPE_LUT[c | first << 8 | lane4 << 10]
+
+    data_mask, data_shift, ctrl_mask, os0, os4 = ENC_LAYOUT[bt]
+
+    b = bt | (d << data_shift) & data_mask
+
+    if ctrl_mask:
+        # remap control characters, data lanes map to error
+        ctrl = 0
+        for i in range(8):
+            if c & (1 << i):
+                ctrl |= XGMII_TO_CTRL[(d >> i*8) & 0xff] << i*7
+            else:
+                ctrl |= CTRL_ERROR << i*7
+        b |= (ctrl & ctrl_mask) << 8
+
+    if os0 and d & 0xff == XGMII_SIG_OS:
+        # signal ordered set
+        b |= O_SIG_OS << 32
+    if os4 and (d >> 32) & 0xff == XGMII_SIG_OS:
+        # signal ordered set
+        b |= O_SIG_OS << 36
+
+    return SYNC_CTRL, b
+
+def decode_block(header, data):
+    """
+    Decode one 64b66b block into a 64 bit XGMII transfer.  Returns (d, c)
+    with lane 0 in the LSB.  Invalid blocks decode to error characters.
+    """
+    if header == SYNC_DATA:
+        return data, 0x00
+
+    if header == SYNC_CTRL:
+        layout = DEC_LAYOUT.get(data & 0xff)
+
+        if layout is not None:
+            c, data_mask, data_shift, ctrl_lanes, d, os0, os4 = layout
+
+            d |= (data >> data_shift) & data_mask
+
+            for i in ctrl_lanes:
+                d |= CTRL_TO_XGMII[(data >> i*7+8) & 0x7f] << i*8
+
+            if os0:
+                d |= O_TO_XGMII[(data >> 32) & 0xf]
+            if os4:
+                d |= O_TO_XGMII[(data >> 36) & 0xf] << 32
+
+            return d, c
+
+    # invalid sync header or block type
+    return 0xfefefefefefefefe, 0xff
+
+def encode_frame(frame, offset_start=False):
+    """
+    Encode a complete XGMIIFrame (starting with preamble) into a list of
+    (header, data) blocks, optionally starting in lane 4.  The frame is
+    terminated and padded to a block boundary with idles.
+    """
+    frame = xgmii_ep.XGMIIFrame(frame)
+    dl, cl = frame.build()
+
+    assert len(dl) > 0
+    assert dl[0] == ETH_PRE
+
+    dl = bytearray(dl)
+    cl = bytearray(cl)
+
+    dl[0] = XGMII_START
+    cl[0] = 1
+    dl.append(XGMII_TERM)
+    cl.append(1)
+
+    if offset_start:
+        dl[0:0] = bytes([XGMII_IDLE]*4)
+        cl[0:0] = b'\x01'*4
+
+    # pad length to multiple of 8 by adding idles
+    if len(dl)%8:
+        cl.extend(b'\x01'*(8-(len(dl)%8)))
+        dl.extend(bytes([XGMII_IDLE]*(8-(len(dl)%8))))
+
+    blocks = []
+    dv = memoryview(dl)
+    zero = bytes(8)
+
+    for k in range(0, len(dl), 8):
+        d = int.from_bytes(dv[k:k+8], 'little')
+        if cl[k:k+8] == zero:
+            blocks.append((SYNC_DATA, d))
+        else:
+            c = 0
+            for i in range(8):
+                if cl[k+i]:
+                    c |= 1 << i
+            blocks.append(encode_block(d, c))
+
+    return blocks
+
+def decode_blocks(blocks):
+    """
+    Decode a sequence of (header, data) blocks into a list of XGMIIFrames.
+    Frames start on a start character in lane 0 or lane 4 and end on the
+    next control character.
+    """
+    frames = []
+    frame = None
+    d = bytearray()
+    c = bytearray()
+
+    for header, data in blocks:
+        bd, bc = decode_block(header, data)
+
+        if frame is None:
+            if bc & 0x01 and bd & 0xff == XGMII_START:
+                # start in lane 0
+                frame = xgmii_ep.XGMIIFrame()
+                d = bytearray([ETH_PRE]) + bd.to_bytes(8, 'little')[1:]
+                c = bytearray([0]) + bytes((bc >> i) & 1 for i in range(1, 8))
+            elif bc & 0x10 and (bd >> 32) & 0xff == XGMII_START:
+                # start in lane 4
+                frame = xgmii_ep.XGMIIFrame()
+                d = bytearray([ETH_PRE]) + bd.to_bytes(8, 'little')[5:]
+                c = bytearray([0]) + bytes((bc >> i) & 1 for i in range(5, 8))
+        elif not bc:
+            d.extend(bd.to_bytes(8, 'little'))
+            c.extend(bytes(8))
+        else:
+            for i in range(8):
+                if bc & (1 << i):
+                    # got a control character; terminate frame reception
+                    if (bd >> i*8) & 0xff != XGMII_TERM:
+                        # store control character if it's not a termination
+                        d.append((bd >> i*8) & 0xff)
+                        c.append(1)
+                    frame.parse(d, list(c))
+                    frames.append(frame)
+                    frame = None
+                    break
+                else:
+                    d.append((bd >> i*8) & 0xff)
+                    c.append(0)
+
+    return frames
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+from myhdl import *
+import random
+import time
+
+import baser_codec
+import baser_serdes_ep
+import xgmii_ep
+
+BLOCK_COUNT = 20000
+JUMBO_FRAME_COUNT = 20
+LOOPBACK_FRAME_COUNT = 50
+
+def bit_scramble(state, data):
+    # reference bit-serial scrambler
+    b = 0
+    for i in range(64):
+        if bool(state & (1<<38)) ^ bool(state & (1<<57)) ^ bool(data & (1 << i)):
+            state = ((state & 0x1ffffffffffffff) << 1) | 1
+            b = b | (1 << i)
+        else:
+            state = (state & 0x1ffffffffffffff) << 1
+    return state, b
+
+def bit_descramble(state, data):
+    # reference bit-serial descrambler
+    b = 0
+    for i in range(64):
+        if bool(state & (1<<38)) ^ bool(state & (1<<57)) ^ bool(data & (1 << i)):
+            b = b | (1 << i)
+        state = (state & 0x1ffffffffffffff) << 1 | bool(data & (1 << i))
+    return state, b
+
+def report(name, count, t):
+    print("%-32s %10.0f blocks/sec" % (name, count/t))
+
+def bench_scrambler(blocks):
+    state = 0
+    ref = []
+    start = time.perf_counter()
+    for data in blocks:
+        state, data = bit_scramble(state, data)
+        ref.append(data)
+    report("scrambler (bit serial)", len(blocks), time.perf_counter()-start)
+
+    scrambler = baser_serdes_ep.BaseRScrambler()
+    start = time.perf_counter()
+    out = [scrambler.scramble(data) for data in blocks]
+    report("scrambler (word parallel)", len(blocks), time.perf_counter()-start)
+
+    assert out == ref
+
+    return ref
+
+def bench_descrambler(blocks, scrambled):
+    state = 0
+    ref = []
+    start = time.perf_counter()
+    for data in scrambled:
+        state, data = bit_descramble(state, data)
+        ref.append(data)
+    report("descrambler (bit serial)", len(scrambled), time.perf_counter()-start)
+
+    descrambler = baser_serdes_ep.BaseRDescrambler()
+    start = time.perf_counter()
+    out = [descrambler.descramble(data) for data in scrambled]
+    report("descrambler (word parallel)", len(scrambled), time.perf_counter()-start)
+
+    assert out == ref
+    assert out == blocks
+
+def bench_bit_reverse(blocks):
+    start = time.perf_counter()
+    ref = [sum(1 << (63-i) for i in range(64) if (data >> i) & 1) for data in blocks]
+    report("bit reverse (bit serial)", len(blocks), time.perf_counter()-start)
+
+    start = time.perf_counter()
+    out = [baser_serdes_ep.bit_reverse_64(data) for data in blocks]
+    report("bit reverse (byte table)", len(blocks), time.perf_counter()-start)
+
+    assert out == ref
+
+def bench_codec():
+    frames = []
+    for k in range(JUMBO_FRAME_COUNT):
+        payload = bytearray(random.getrandbits(8) for i in range(9000))
+        frames.append(xgmii_ep.XGMIIFrame(b'\x55\x55\x55\x55\x55\x55\x55\xD5'+payload))
+
+    start = time.perf_counter()
+    blocks = []
+    for k, frame in enumerate(frames):
+        blocks.extend(baser_codec.encode_frame(frame, k % 2))
+    report("encode_frame (9000 byte frames)", len(blocks), time.perf_counter()-start)
+
+    start = time.perf_counter()
+    rx_frames = baser_codec.decode_blocks(blocks)
+    report("decode_blocks (9000 byte frames)", len(blocks), time.perf_counter()-start)
+
+    assert len(rx_frames) == len(frames)
+    for rx_frame, frame in zip(rx_frames, frames):
+        assert rx_frame.data == frame.data
+
+def bench_loopback(reverse=False):
+    # back-to-back frames from source to sink at line rate
+
+    clk = Signal(bool(0))
+    serdes_data = Signal(intbv(0)[64:])
+    serdes_hdr = Signal(intbv(1)[2:])
+
+    serdes_source = baser_serdes_ep.BaseRSerdesSource()
+
+    serdes_source_logic = serdes_source.create_logic(
+        clk,
+        tx_data=serdes_data,
+        tx_header=serdes_hdr,
+        reverse=reverse
+    )
+
+    serdes_sink = baser_serdes_ep.BaseRSerdesSink()
+
+    serdes_sink_logic = serdes_sink.create_logic(
+        clk,
+        rx_data=serdes_data,
+        rx_header=serdes_hdr,
+        reverse=reverse
+    )
+
+    frames = []
+    for k in range(LOOPBACK_FRAME_COUNT):
+        payload = bytearray(random.getrandbits(8) for i in range(1500))
+        frame = xgmii_ep.XGMIIFrame(b'\x55\x55\x55\x55\x55\x55\x55\xD5'+payload)
+        frames.append(frame)
+        serdes_source.send(frame)
+
+    cycles = [0]
+
+    @always(delay(4))
+    def clkgen():
+        clk.next = not clk
+
+    @instance
+    def check():
+        for frame in frames:
+            while serdes_sink.empty():
+                yield clk.posedge
+                cycles[0] += 1
+            rx_frame = serdes_sink.recv()
+            assert rx_frame.data == frame.data
+
+        raise StopSimulation
+
+    start = time.perf_counter()
+    Simulation(serdes_source_logic, serdes_sink_logic, clkgen, check).run(quiet=1)
+    report("loopback (reverse=%s)" % reverse, cycles[0], time.perf_counter()-start)
+
+def bench():
+    random.seed(0)
+
+    # mix of random data and idle blocks
+    blocks = [random.getrandbits(64) if k % 4 else 0x1e for k in range(BLOCK_COUNT)]
+
+    scrambled = bench_scrambler(blocks)
+    bench_descrambler(blocks, scrambled)
+
+    bench_bit_reverse(blocks)
+
+    bench_codec()
+
+    bench_loopback(reverse=False)
+    bench_loopback(reverse=True)
+
+if __name__ == '__main__':
+    print("Running benchmark...")
+    bench()
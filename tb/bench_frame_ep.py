@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import gc
+import random
+import time
+import tracemalloc
+
+import axis_ep
+import eth_ep
+import gmii_ep
+import udp_ep
+
+FRAME_COUNT = 100000
+
+def report(name, count, t, mem):
+    print("%-36s %10.0f frames/sec %8.0f bytes/frame" % (name, count/t, mem/count))
+
+def measure(name, func):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = func()
+    t = time.perf_counter()-start
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    report(name, FRAME_COUNT, t, mem)
+    return obj
+
+def bench():
+    random.seed(0)
+
+    payloads = [bytes(random.getrandbits(8) for i in range(random.randint(18, 64))) for k in range(256)]
+
+    def eth_frames():
+        frames = []
+        for k in range(FRAME_COUNT):
+            frame = eth_ep.EthFrame()
+            frame.eth_dest_mac = 0xDAD1D2D3D4D5
+            frame.eth_src_mac = 0x5A5152535455
+            frame.eth_type = 0x8000
+            frame.payload = payloads[k % len(payloads)]
+            frames.append(frame)
+        return frames
+
+    frames = measure("EthFrame construct", eth_frames)
+
+    measure("EthFrame copy", lambda: [eth_ep.EthFrame(frame) for frame in frames])
+
+    def eth_queue():
+        source = eth_ep.EthFrameSource()
+        for frame in frames:
+            source.send(frame)
+        return source
+
+    measure("EthFrameSource queue", eth_queue)
+
+    def udp_queue():
+        source = udp_ep.UDPFrameSource()
+        for k in range(FRAME_COUNT):
+            source.send(udp_ep.UDPFrame(payload=payloads[k % len(payloads)], udp_source_port=1234, udp_dest_port=5678))
+        return source
+
+    measure("UDPFrameSource queue", udp_queue)
+
+    def axis_queue():
+        source = axis_ep.AXIStreamSource()
+        for frame in frames:
+            source.send(frame.payload)
+        return source
+
+    measure("AXIStreamSource queue", axis_queue)
+
+    def gmii_queue():
+        source = gmii_ep.GMIISource()
+        for k in range(FRAME_COUNT):
+            source.send(b'\x55\x55\x55\x55\x55\x55\x55\xD5'+payloads[k % len(payloads)])
+        return source
+
+    measure("GMIISource queue", gmii_queue)
+
+if __name__ == '__main__':
+    print("Running benchmark...")
+    bench()
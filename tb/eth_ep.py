@@ -24,33 +24,47 @@ THE SOFTWARE.
 
 from myhdl import *
 import axis_ep
+from collections import deque
 import struct
 import zlib
 
+eth_hdr = struct.Struct('>HLHLH')
+eth_fcs = struct.Struct('<L')
+
+ETH_HDR_LEN = eth_hdr.size
+
+def pack_eth_header(buf, offset, frame):
+    eth_hdr.pack_into(buf, offset,
+        frame.eth_dest_mac >> 32, frame.eth_dest_mac & 0xffffffff,
+        frame.eth_src_mac >> 32, frame.eth_src_mac & 0xffffffff,
+        frame.eth_type
+    )
+
 class EthFrame(object):
+    __slots__ = ('_payload', 'eth_dest_mac', 'eth_src_mac', 'eth_type', 'eth_fcs')
+
     def __init__(self, payload=b'', eth_dest_mac=0, eth_src_mac=0, eth_type=0, eth_fcs=None):
-        self._payload = axis_ep.AXIStreamFrame()
         self.eth_dest_mac = eth_dest_mac
         self.eth_src_mac = eth_src_mac
         self.eth_type = eth_type
         self.eth_fcs = eth_fcs
 
         if type(payload) is dict:
-            self.payload = axis_ep.AXIStreamFrame(payload['eth_payload'])
+            self._payload = axis_ep.AXIStreamFrame(payload['eth_payload'])
             self.eth_dest_mac = payload['eth_dest_mac']
             self.eth_src_mac = payload['eth_src_mac']
             self.eth_type = payload['eth_type']
             self.eth_fcs = payload['eth_fcs']
-        if type(payload) is bytes:
-            payload = bytearray(payload)
-        if type(payload) is bytearray or type(payload) is axis_ep.AXIStreamFrame:
-            self.payload = axis_ep.AXIStreamFrame(payload)
-        if type(payload) is EthFrame:
-            self.payload = axis_ep.AXIStreamFrame(payload.payload)
+        elif type(payload) in (bytes, bytearray, axis_ep.AXIStreamFrame):
+            self._payload = axis_ep.AXIStreamFrame(payload)
+        elif type(payload) is EthFrame:
+            self._payload = axis_ep.AXIStreamFrame(payload._payload)
             self.eth_dest_mac = payload.eth_dest_mac
             self.eth_src_mac = payload.eth_src_mac
             self.eth_type = payload.eth_type
             self.eth_fcs = payload.eth_fcs
+        else:
+            self._payload = axis_ep.AXIStreamFrame()
 
     @property
     def payload(self):
@@ -61,33 +75,31 @@ class EthFrame(object):
         self._payload = axis_ep.AXIStreamFrame(value)
 
     def calc_fcs(self):
-        frame = self.build_axis().data
-
-        return zlib.crc32(bytes(frame)) & 0xffffffff
+        return zlib.crc32(self.build_bytes()) & 0xffffffff
 
     def update_fcs(self):
         self.eth_fcs = self.calc_fcs()
 
-    def build_axis(self):
-        data = b''
-
-        data += struct.pack('>Q', self.eth_dest_mac)[2:]
-        data += struct.pack('>Q', self.eth_src_mac)[2:]
-        data += struct.pack('>H', self.eth_type)
+    def build_bytes(self, fcs=False):
+        # header, payload and FCS written straight into a single buffer
+        n = ETH_HDR_LEN + self.payload.length()
+        buf = bytearray(n+4 if fcs else n)
 
-        data += self.payload.data
+        pack_eth_header(buf, 0, self)
+        self.payload.write_into(buf, ETH_HDR_LEN)
 
-        return axis_ep.AXIStreamFrame(data)
-
-    def build_axis_fcs(self):
-        if self.eth_fcs is None:
-            self.update_fcs()
+        if fcs:
+            if self.eth_fcs is None:
+                self.eth_fcs = zlib.crc32(memoryview(buf)[:n]) & 0xffffffff
+            eth_fcs.pack_into(buf, n, self.eth_fcs)
 
-        data = self.build_axis().data
+        return buf
 
-        data += struct.pack('<L', self.eth_fcs)
+    def build_axis(self):
+        return axis_ep.AXIStreamFrame.from_buffer(self.build_bytes())
 
-        return axis_ep.AXIStreamFrame(data)
+    def build_axis_fcs(self):
+        return axis_ep.AXIStreamFrame.from_buffer(self.build_bytes(fcs=True))
 
     def parse_axis(self, data):
         data = axis_ep.AXIStreamFrame(data).data
@@ -121,11 +133,13 @@ class EthFrame(object):
 
 
 class EthFrameSource():
-    def __init__(self):
+    def __init__(self, idle_sleep=False):
         self.active = False
         self.has_logic = False
         self.queue = []
-        self.payload_source = axis_ep.AXIStreamSource()
+        self.payload_source = axis_ep.AXIStreamSource(idle_sleep=idle_sleep)
+        self.idle_sleep = idle_sleep
+        self.sleep = axis_ep.IdleSleep()
         self.header_queue = []
         self.clk = Signal(bool(0))
 
@@ -136,6 +150,7 @@ class EthFrameSource():
             self.payload_source.send(frame.payload)
         else:
             self.queue.append(frame)
+        self.sleep.notify()
 
     def count(self):
         return len(self.queue)
@@ -190,12 +205,19 @@ class EthFrameSource():
         def logic():
             frame = EthFrame()
 
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
 
                 if rst:
                     eth_hdr_valid.next = False
                     self.active = False
+                    idle = False
                 else:
                     eth_hdr_valid.next = self.active and (eth_hdr_valid or not pause)
                     if eth_hdr_ready and eth_hdr_valid:
@@ -218,20 +240,32 @@ class EthFrameSource():
                         self.header_queue.append(frame)
                         self.payload_source.send(frame.payload)
 
+                    idle = not self.active and not self.header_queue and not self.queue
+
         return instances()
 
 
 class EthFrameSink():
-    def __init__(self):
+    def __init__(self, callback=None, expected=None, maxlen=None):
         self.has_logic = False
-        self.queue = []
+        self.queue = deque()
         self.payload_sink = axis_ep.AXIStreamSink()
-        self.header_queue = []
+        self.header_queue = deque()
         self.sync = Signal(intbv(0))
+        self.scoreboard = axis_ep.FrameScoreboard()
+        if callback is not None or expected is not None or maxlen is not None:
+            self.stream(callback, expected, maxlen)
+
+    def stream(self, callback=None, expected=None, maxlen=None):
+        if maxlen is None:
+            maxlen = axis_ep.stream_queue_len
+        self.scoreboard = axis_ep.FrameScoreboard(callback, expected)
+        self.queue = deque(self.queue, maxlen=maxlen)
+        return self.scoreboard
 
     def recv(self):
         if self.queue:
-            return self.queue.pop(0)
+            return self.queue.popleft()
         return None
 
     def count(self):
@@ -311,9 +345,10 @@ class EthFrameSink():
                         self.header_queue.append(frame)
 
                     if not self.payload_sink.empty() and self.header_queue:
-                        frame = self.header_queue.pop(0)
+                        frame = self.header_queue.popleft()
                         frame.payload = self.payload_sink.recv()
                         self.queue.append(frame)
+                        self.scoreboard.receive(frame, frame.payload.length())
                         self.sync.next = not self.sync
 
                         if name is not None:
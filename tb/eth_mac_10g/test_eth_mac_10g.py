@@ -35,6 +35,11 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 
+from wave_window import WindowedTrace, on_failure
+import mac_bench
+import traffic
+import latency
+
 from cocotbext.eth import XgmiiFrame, XgmiiSource, XgmiiSink
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
 
@@ -62,6 +67,14 @@ class TB:
         dut.rx_ptp_ts.setimmediatevalue(0)
         dut.tx_ptp_ts.setimmediatevalue(0)
 
+        # WAVE_WINDOW=<cycles> keeps a rolling waveform window, dumped on failure
+        self.trace = WindowedTrace.from_env(dut, [dut.tx_clk, dut.rx_clk], [
+            "tx_rst", "tx_axis_tdata", "tx_axis_tkeep", "tx_axis_tvalid", "tx_axis_tready",
+            "tx_axis_tlast", "tx_axis_tuser", "xgmii_txd", "xgmii_txc",
+            "rx_rst", "xgmii_rxd", "xgmii_rxc", "rx_axis_tdata", "rx_axis_tkeep",
+            "rx_axis_tvalid", "rx_axis_tlast", "rx_axis_tuser",
+            "tx_error_underflow", "rx_error_bad_frame", "rx_error_bad_fcs"])
+
     async def reset(self):
         self.dut.rx_rst.setimmediatevalue(0)
         self.dut.tx_rst.setimmediatevalue(0)
@@ -130,6 +143,52 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None, ifg=12):
     await RisingEdge(dut.tx_clk)
 
 
+async def run_test_traffic(dut, sizes=None, arrivals=None, count=100, ifg=12):
+
+    tb = TB(dut)
+
+    byte_width = len(dut.xgmii_txd) // 8
+    byte_time = (6.4 if byte_width == 8 else 3.2) / byte_width
+
+    tb.xgmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    profile = traffic.TrafficProfile.from_env(sizes(), arrivals())
+    tb.log.info("Traffic profile: %s", profile)
+
+    tx_frames = profile.frames(count, min_size=64)
+    rx_frames = profile.frames(count, min_size=64)
+
+    tx_cr = cocotb.fork(traffic.drive(tb.axis_source, tx_frames, byte_time))
+    rx_cr = cocotb.fork(traffic.drive(tb.xgmii_source, rx_frames, byte_time, XgmiiFrame.from_payload))
+
+    for payload, gap in tx_frames:
+        rx_frame = await tb.xgmii_sink.recv()
+
+        assert rx_frame.get_payload() == payload
+        assert rx_frame.check_fcs()
+        assert rx_frame.ctrl is None
+
+    for payload, gap in rx_frames:
+        rx_frame = await tb.axis_sink.recv()
+
+        assert rx_frame.tdata == payload
+        assert rx_frame.tuser == 0
+
+    for name, frames, cr in [("TX", tx_frames, tx_cr), ("RX", rx_frames, rx_cr)]:
+        t = await cr.join()
+        wire = sum(traffic.wire_bytes(len(payload)+4) for payload, gap in frames)
+        tb.log.info("%s: %d frames in %.1f ns, %.1f%% of line rate", name, len(frames), t, 100*wire*byte_time/t)
+
+    assert tb.xgmii_sink.empty()
+    assert tb.axis_sink.empty()
+
+    await RisingEdge(dut.tx_clk)
+    await RisingEdge(dut.tx_clk)
+
+
 async def run_test_tx_alignment(dut, payload_data=None, ifg=12):
 
     enable_dic = int(os.getenv("PARAM_ENABLE_DIC"))
@@ -200,6 +259,68 @@ async def run_test_tx_alignment(dut, payload_data=None, ifg=12):
     await RisingEdge(dut.tx_clk)
 
 
+async def run_bench(dut, ifg=12):
+
+    tb = TB(dut)
+
+    enable_dic = int(os.getenv("PARAM_ENABLE_DIC"))
+    byte_width = len(dut.xgmii_txd) // 8
+    params = {'DATA_WIDTH': len(dut.xgmii_txd), 'ENABLE_DIC': enable_dic}
+
+    tb.xgmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    await mac_bench.run_tx_bench(tb.axis_source, tb.xgmii_sink, 6.4 if byte_width == 8 else 3.2, byte_width,
+        ifg=ifg, lane_align=4, dic=enable_dic, name="eth_mac_10g", params=params)
+    await mac_bench.run_rx_bench(tb.xgmii_source, tb.axis_sink, XgmiiFrame, 6.4 if byte_width == 8 else 3.2, byte_width,
+        ifg=ifg, name="eth_mac_10g", params=params)
+
+
+async def run_latency(dut, ifg=12, count=16):
+
+    tb = TB(dut)
+
+    byte_width = len(dut.xgmii_txd) // 8
+    period = 6.4 if byte_width == 8 else 3.2
+    config = {'DATA_WIDTH': len(dut.xgmii_txd), 'ENABLE_DIC': int(os.getenv("PARAM_ENABLE_DIC"))}
+
+    tb.xgmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    stats = latency.LatencyStats()
+
+    tx_probe = latency.LatencyProbe(stats, "eth_mac_10g tx", period, config)
+    tx_probe.input_axis(dut.tx_clk, dut.tx_axis_tvalid, dut.tx_axis_tready, dut.tx_axis_tlast, dut.tx_axis_tkeep)
+    tx_probe.output_xgmii(dut.tx_clk, dut.xgmii_txd, dut.xgmii_txc)
+
+    rx_probe = latency.LatencyProbe(stats, "eth_mac_10g rx", period, config)
+    rx_probe.input_xgmii(dut.rx_clk, dut.xgmii_rxd, dut.xgmii_rxc)
+    rx_probe.output_axis(dut.rx_clk, dut.rx_axis_tvalid, None, dut.rx_axis_tlast, dut.rx_axis_tkeep)
+
+    # one frame in flight at a time, so queueing does not add to the latency
+    for size in mac_bench.rfc2544_sizes:
+        payload = incrementing_payload(size-mac_bench.FCS_LEN)
+
+        for k in range(count):
+            await tb.axis_source.send(payload)
+            rx_frame = await tb.xgmii_sink.recv()
+            assert rx_frame.get_payload() == payload
+
+            await tb.xgmii_source.send(XgmiiFrame.from_payload(payload))
+            rx_frame = await tb.axis_sink.recv()
+            assert rx_frame.tdata == payload
+
+    tx_probe.stop()
+    rx_probe.stop()
+
+    stats.log_summary(tb.log)
+    stats.write()
+
+
 def size_list():
     return list(range(60, 128)) + [512, 1514, 9214] + [60]*10
 
@@ -212,22 +333,43 @@ def cycle_en():
     return itertools.cycle([0, 0, 0, 1])
 
 
-if cocotb.SIM_NAME:
+if cocotb.SIM_NAME and os.getenv("MAC_BENCH"):
+
+    factory = TestFactory(on_failure(run_bench))
+    factory.add_option("ifg", [12])
+    factory.generate_tests()
+
+elif cocotb.SIM_NAME:
 
     for test in [run_test_rx, run_test_tx]:
 
-        factory = TestFactory(test)
+        factory = TestFactory(on_failure(test))
         factory.add_option("payload_lengths", [size_list])
         factory.add_option("payload_data", [incrementing_payload])
         factory.add_option("ifg", [12, 0])
         factory.generate_tests()
 
-    factory = TestFactory(run_test_tx_alignment)
+    factory = TestFactory(on_failure(run_test_tx_alignment))
     factory.add_option("payload_data", [incrementing_payload])
     factory.add_option("ifg", [12])
     factory.generate_tests()
 
 
+if cocotb.SIM_NAME and os.getenv("TRAFFIC"):
+
+    factory = TestFactory(on_failure(run_test_traffic))
+    factory.add_option("sizes", [traffic.imix])
+    factory.add_option("arrivals", [traffic.OnOff])
+    factory.generate_tests()
+
+
+if cocotb.SIM_NAME and os.getenv("LATENCY"):
+
+    factory = TestFactory(on_failure(run_latency))
+    factory.add_option("ifg", [12])
+    factory.generate_tests()
+
+
 # cocotb-test
 
 tests_dir = os.path.abspath(os.path.dirname(__file__))
@@ -236,9 +378,10 @@ lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'axis', 'rtl'))
 
 
+@pytest.mark.simulator("verilator")
 @pytest.mark.parametrize("enable_dic", [1, 0])
 @pytest.mark.parametrize("data_width", [32, 64])
-def test_eth_mac_10g(request, data_width, enable_dic):
+def test_eth_mac_10g(request, data_width, enable_dic, bench=False):
     dut = "eth_mac_10g"
     module = os.path.splitext(os.path.basename(__file__))[0]
     toplevel = dut
@@ -276,6 +419,17 @@ def test_eth_mac_10g(request, data_width, enable_dic):
     sim_build = os.path.join(tests_dir, "sim_build",
         request.node.name.replace('[', '-').replace(']', ''))
 
+    if bench:
+        extra_env['MAC_BENCH'] = '1'
+        extra_env['MAC_BENCH_FILE'] = os.path.join(sim_build, "mac_bench.json")
+        if os.path.exists(extra_env['MAC_BENCH_FILE']):
+            os.remove(extra_env['MAC_BENCH_FILE'])
+
+    if os.getenv("LATENCY"):
+        extra_env['LATENCY_FILE'] = os.path.join(sim_build, "latency.json")
+        if os.path.exists(extra_env['LATENCY_FILE']):
+            os.remove(extra_env['LATENCY_FILE'])
+
     cocotb_test.simulator.run(
         python_search=[tests_dir],
         verilog_sources=verilog_sources,
@@ -285,3 +439,11 @@ def test_eth_mac_10g(request, data_width, enable_dic):
         sim_build=sim_build,
         extra_env=extra_env,
     )
+
+
+@pytest.mark.simulator("verilator")
+@pytest.mark.benchmark
+@pytest.mark.parametrize("enable_dic", [1, 0])
+@pytest.mark.parametrize("data_width", [32, 64])
+def test_eth_mac_10g_bench(request, data_width, enable_dic):
+    test_eth_mac_10g(request, data_width, enable_dic, bench=True)
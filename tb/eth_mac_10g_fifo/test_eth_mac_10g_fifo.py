@@ -35,6 +35,10 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 
+import mac_bench
+import traffic
+import latency
+
 from cocotbext.eth import XgmiiFrame, XgmiiSource, XgmiiSink
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
 
@@ -136,6 +140,60 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None, ifg=12):
     await RisingEdge(dut.logic_clk)
 
 
+async def run_test_traffic(dut, sizes=None, arrivals=None, count=100, ifg=12):
+
+    tb = TB(dut)
+
+    byte_width = len(dut.xgmii_txd) // 8
+    byte_time = (6.4 if byte_width == 8 else 3.2) / byte_width
+
+    tb.xgmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    profile = traffic.TrafficProfile.from_env(sizes(), arrivals())
+    tb.log.info("Traffic profile: %s", profile)
+
+    tx_fifo = traffic.FifoOccupancy(dut.tx_fifo.fifo_inst, dut.tx_clk)
+    rx_fifo = traffic.FifoOccupancy(dut.rx_fifo.fifo_inst, dut.logic_clk)
+
+    tx_frames = profile.frames(count, min_size=64)
+    rx_frames = profile.frames(count, min_size=64)
+
+    tx_cr = cocotb.fork(traffic.drive(tb.axis_source, tx_frames, byte_time))
+    rx_cr = cocotb.fork(traffic.drive(tb.xgmii_source, rx_frames, byte_time, XgmiiFrame.from_payload))
+
+    for payload, gap in tx_frames:
+        rx_frame = await tb.xgmii_sink.recv()
+
+        assert rx_frame.get_payload() == payload
+        assert rx_frame.check_fcs()
+        assert rx_frame.ctrl is None
+
+    for payload, gap in rx_frames:
+        rx_frame = await tb.axis_sink.recv()
+
+        assert rx_frame.tdata == payload
+        assert rx_frame.tuser == 0
+
+    for name, frames, cr in [("TX", tx_frames, tx_cr), ("RX", rx_frames, rx_cr)]:
+        t = await cr.join()
+        wire = sum(traffic.wire_bytes(len(payload)+4) for payload, gap in frames)
+        tb.log.info("%s: %d frames in %.1f ns, %.1f%% of line rate", name, len(frames), t, 100*wire*byte_time/t)
+
+    tx_fifo.stop()
+    rx_fifo.stop()
+    tb.log.info("TX FIFO occupancy: %s", tx_fifo)
+    tb.log.info("RX FIFO occupancy: %s", rx_fifo)
+
+    assert tb.xgmii_sink.empty()
+    assert tb.axis_sink.empty()
+
+    await RisingEdge(dut.logic_clk)
+    await RisingEdge(dut.logic_clk)
+
+
 async def run_test_tx_alignment(dut, payload_data=None, ifg=12):
 
     enable_dic = int(os.getenv("PARAM_ENABLE_DIC"))
@@ -206,6 +264,70 @@ async def run_test_tx_alignment(dut, payload_data=None, ifg=12):
     await RisingEdge(dut.logic_clk)
 
 
+async def run_bench(dut, ifg=12):
+
+    tb = TB(dut)
+
+    enable_dic = int(os.getenv("PARAM_ENABLE_DIC"))
+    byte_width = len(dut.xgmii_txd) // 8
+    params = {'DATA_WIDTH': len(dut.xgmii_txd), 'ENABLE_DIC': enable_dic}
+
+    tb.xgmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    await mac_bench.run_tx_bench(tb.axis_source, tb.xgmii_sink, 6.4 if byte_width == 8 else 3.2, byte_width,
+        ifg=ifg, lane_align=4, dic=enable_dic, name="eth_mac_10g_fifo", params=params)
+    await mac_bench.run_rx_bench(tb.xgmii_source, tb.axis_sink, XgmiiFrame, 6.4 if byte_width == 8 else 3.2, byte_width,
+        ifg=ifg, name="eth_mac_10g_fifo", params=params)
+
+
+async def run_latency(dut, ifg=12, count=16):
+
+    tb = TB(dut)
+
+    byte_width = len(dut.xgmii_txd) // 8
+    period = 6.4 if byte_width == 8 else 3.2
+    config = {'DATA_WIDTH': len(dut.xgmii_txd), 'ENABLE_DIC': int(os.getenv("PARAM_ENABLE_DIC"))}
+    config['TX_FRAME_FIFO'] = int(os.getenv("PARAM_TX_FRAME_FIFO"))
+    config['RX_FRAME_FIFO'] = int(os.getenv("PARAM_RX_FRAME_FIFO"))
+
+    tb.xgmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    stats = latency.LatencyStats()
+
+    tx_probe = latency.LatencyProbe(stats, "eth_mac_10g_fifo tx", period, config)
+    tx_probe.input_axis(dut.logic_clk, dut.tx_axis_tvalid, dut.tx_axis_tready, dut.tx_axis_tlast, dut.tx_axis_tkeep)
+    tx_probe.output_xgmii(dut.tx_clk, dut.xgmii_txd, dut.xgmii_txc)
+
+    rx_probe = latency.LatencyProbe(stats, "eth_mac_10g_fifo rx", period, config)
+    rx_probe.input_xgmii(dut.rx_clk, dut.xgmii_rxd, dut.xgmii_rxc)
+    rx_probe.output_axis(dut.logic_clk, dut.rx_axis_tvalid, dut.rx_axis_tready, dut.rx_axis_tlast, dut.rx_axis_tkeep)
+
+    # one frame in flight at a time, so queueing does not add to the latency
+    for size in mac_bench.rfc2544_sizes:
+        payload = incrementing_payload(size-mac_bench.FCS_LEN)
+
+        for k in range(count):
+            await tb.axis_source.send(payload)
+            rx_frame = await tb.xgmii_sink.recv()
+            assert rx_frame.get_payload() == payload
+
+            await tb.xgmii_source.send(XgmiiFrame.from_payload(payload))
+            rx_frame = await tb.axis_sink.recv()
+            assert rx_frame.tdata == payload
+
+    tx_probe.stop()
+    rx_probe.stop()
+
+    stats.log_summary(tb.log)
+    stats.write()
+
+
 def size_list():
     return list(range(60, 128)) + [512, 1514, 9214] + [60]*10
 
@@ -218,7 +340,13 @@ def cycle_en():
     return itertools.cycle([0, 0, 0, 1])
 
 
-if cocotb.SIM_NAME:
+if cocotb.SIM_NAME and os.getenv("MAC_BENCH"):
+
+    factory = TestFactory(run_bench)
+    factory.add_option("ifg", [12])
+    factory.generate_tests()
+
+elif cocotb.SIM_NAME:
 
     for test in [run_test_rx, run_test_tx]:
 
@@ -234,6 +362,21 @@ if cocotb.SIM_NAME:
     factory.generate_tests()
 
 
+if cocotb.SIM_NAME and os.getenv("TRAFFIC"):
+
+    factory = TestFactory(run_test_traffic)
+    factory.add_option("sizes", [traffic.imix])
+    factory.add_option("arrivals", [traffic.OnOff])
+    factory.generate_tests()
+
+
+if cocotb.SIM_NAME and os.getenv("LATENCY"):
+
+    factory = TestFactory(run_latency)
+    factory.add_option("ifg", [12])
+    factory.generate_tests()
+
+
 # cocotb-test
 
 tests_dir = os.path.abspath(os.path.dirname(__file__))
@@ -242,9 +385,10 @@ lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'axis', 'rtl'))
 
 
+@pytest.mark.simulator("verilator")
 @pytest.mark.parametrize("enable_dic", [1, 0])
 @pytest.mark.parametrize("data_width", [32, 64])
-def test_eth_mac_10g_fifo(request, data_width, enable_dic):
+def test_eth_mac_10g_fifo(request, data_width, enable_dic, bench=False):
     dut = "eth_mac_10g_fifo"
     module = os.path.splitext(os.path.basename(__file__))[0]
     toplevel = dut
@@ -298,6 +442,17 @@ def test_eth_mac_10g_fifo(request, data_width, enable_dic):
     sim_build = os.path.join(tests_dir, "sim_build",
         request.node.name.replace('[', '-').replace(']', ''))
 
+    if bench:
+        extra_env['MAC_BENCH'] = '1'
+        extra_env['MAC_BENCH_FILE'] = os.path.join(sim_build, "mac_bench.json")
+        if os.path.exists(extra_env['MAC_BENCH_FILE']):
+            os.remove(extra_env['MAC_BENCH_FILE'])
+
+    if os.getenv("LATENCY"):
+        extra_env['LATENCY_FILE'] = os.path.join(sim_build, "latency.json")
+        if os.path.exists(extra_env['LATENCY_FILE']):
+            os.remove(extra_env['LATENCY_FILE'])
+
     cocotb_test.simulator.run(
         python_search=[tests_dir],
         verilog_sources=verilog_sources,
@@ -307,3 +462,11 @@ def test_eth_mac_10g_fifo(request, data_width, enable_dic):
         sim_build=sim_build,
         extra_env=extra_env,
     )
+
+
+@pytest.mark.simulator("verilator")
+@pytest.mark.benchmark
+@pytest.mark.parametrize("enable_dic", [1, 0])
+@pytest.mark.parametrize("data_width", [32, 64])
+def test_eth_mac_10g_fifo_bench(request, data_width, enable_dic):
+    test_eth_mac_10g_fifo(request, data_width, enable_dic, bench=True)
@@ -27,6 +27,7 @@ import itertools
 import logging
 import os
 
+import pytest
 import cocotb_test.simulator
 
 import cocotb
@@ -34,6 +35,9 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 
+import mac_bench
+import traffic
+
 from cocotbext.eth import GmiiFrame, GmiiSource, GmiiSink
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
 
@@ -188,6 +192,74 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None, ifg=12, enab
     await RisingEdge(dut.logic_clk)
 
 
+async def run_test_traffic(dut, sizes=None, arrivals=None, count=100, ifg=12):
+
+    tb = TB(dut)
+
+    byte_time = 8
+
+    tb.gmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    profile = traffic.TrafficProfile.from_env(sizes(), arrivals())
+    tb.log.info("Traffic profile: %s", profile)
+
+    tx_fifo = traffic.FifoOccupancy(dut.tx_fifo.fifo_inst, dut.tx_clk)
+    rx_fifo = traffic.FifoOccupancy(dut.rx_fifo.fifo_inst, dut.logic_clk)
+
+    tx_frames = profile.frames(count, min_size=64)
+    rx_frames = profile.frames(count, min_size=64)
+
+    tx_cr = cocotb.fork(traffic.drive(tb.axis_source, tx_frames, byte_time))
+    rx_cr = cocotb.fork(traffic.drive(tb.gmii_source, rx_frames, byte_time, GmiiFrame.from_payload))
+
+    for payload, gap in tx_frames:
+        rx_frame = await tb.gmii_sink.recv()
+
+        assert rx_frame.get_payload() == payload
+        assert rx_frame.check_fcs()
+        assert rx_frame.error is None
+
+    for payload, gap in rx_frames:
+        rx_frame = await tb.axis_sink.recv()
+
+        assert rx_frame.tdata == payload
+        assert rx_frame.tuser == 0
+
+    for name, frames, cr in [("TX", tx_frames, tx_cr), ("RX", rx_frames, rx_cr)]:
+        t = await cr.join()
+        wire = sum(traffic.wire_bytes(len(payload)+4) for payload, gap in frames)
+        tb.log.info("%s: %d frames in %.1f ns, %.1f%% of line rate", name, len(frames), t, 100*wire*byte_time/t)
+
+    tx_fifo.stop()
+    rx_fifo.stop()
+    tb.log.info("TX FIFO occupancy: %s", tx_fifo)
+    tb.log.info("RX FIFO occupancy: %s", rx_fifo)
+
+    assert tb.gmii_sink.empty()
+    assert tb.axis_sink.empty()
+
+    await RisingEdge(dut.logic_clk)
+    await RisingEdge(dut.logic_clk)
+
+
+async def run_bench(dut, ifg=12):
+
+    tb = TB(dut)
+
+    tb.gmii_source.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    await mac_bench.run_tx_bench(tb.axis_source, tb.gmii_sink, 8, 1,
+        ifg=ifg, name="eth_mac_1g_fifo")
+    await mac_bench.run_rx_bench(tb.gmii_source, tb.axis_sink, GmiiFrame, 8, 1,
+        ifg=ifg, name="eth_mac_1g_fifo")
+
+
 def size_list():
     return list(range(60, 128)) + [512, 1514] + [60]*10
 
@@ -200,7 +272,13 @@ def cycle_en():
     return itertools.cycle([0, 0, 0, 1])
 
 
-if cocotb.SIM_NAME:
+if cocotb.SIM_NAME and os.getenv("MAC_BENCH"):
+
+    factory = TestFactory(run_bench)
+    factory.add_option("ifg", [12])
+    factory.generate_tests()
+
+elif cocotb.SIM_NAME:
 
     for test in [run_test_rx, run_test_tx]:
 
@@ -213,6 +291,14 @@ if cocotb.SIM_NAME:
         factory.generate_tests()
 
 
+if cocotb.SIM_NAME and os.getenv("TRAFFIC"):
+
+    factory = TestFactory(run_test_traffic)
+    factory.add_option("sizes", [traffic.imix])
+    factory.add_option("arrivals", [traffic.OnOff])
+    factory.generate_tests()
+
+
 # cocotb-test
 
 tests_dir = os.path.abspath(os.path.dirname(__file__))
@@ -221,7 +307,8 @@ lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'axis', 'rtl'))
 
 
-def test_eth_mac_1g_fifo(request):
+@pytest.mark.simulator("verilator")
+def test_eth_mac_1g_fifo(request, bench=False):
     dut = "eth_mac_1g_fifo"
     module = os.path.splitext(os.path.basename(__file__))[0]
     toplevel = dut
@@ -258,6 +345,12 @@ def test_eth_mac_1g_fifo(request):
     sim_build = os.path.join(tests_dir, "sim_build",
         request.node.name.replace('[', '-').replace(']', ''))
 
+    if bench:
+        extra_env['MAC_BENCH'] = '1'
+        extra_env['MAC_BENCH_FILE'] = os.path.join(sim_build, "mac_bench.json")
+        if os.path.exists(extra_env['MAC_BENCH_FILE']):
+            os.remove(extra_env['MAC_BENCH_FILE'])
+
     cocotb_test.simulator.run(
         python_search=[tests_dir],
         verilog_sources=verilog_sources,
@@ -267,3 +360,9 @@ def test_eth_mac_1g_fifo(request):
         sim_build=sim_build,
         extra_env=extra_env,
     )
+
+
+@pytest.mark.simulator("verilator")
+@pytest.mark.benchmark
+def test_eth_mac_1g_fifo_bench(request):
+    test_eth_mac_1g_fifo(request, bench=True)
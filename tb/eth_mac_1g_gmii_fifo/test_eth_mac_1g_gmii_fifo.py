@@ -27,6 +27,7 @@ import itertools
 import logging
 import os
 
+import pytest
 import cocotb_test.simulator
 
 import cocotb
@@ -34,6 +35,8 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 
+import mac_bench
+
 from cocotbext.eth import GmiiFrame, GmiiPhy
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
 
@@ -152,6 +155,29 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None, ifg=12, spee
     await RisingEdge(dut.tx_clk)
 
 
+async def run_bench(dut, ifg=12, speed=1000e6):
+
+    tb = TB(dut, speed)
+
+    tb.gmii_phy.rx.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    tb.set_speed(speed)
+
+    await tb.reset()
+
+    # wait for link speed detection
+    for k in range(100):
+        await RisingEdge(dut.rx_clk)
+
+    # GMII transfers a byte per clock at 1000 Mbps, MII a nibble per clock otherwise
+    bytes_per_clock = 1 if speed == 1000e6 else 0.5
+    await mac_bench.run_tx_bench(tb.axis_source, tb.gmii_phy.tx, bytes_per_clock*8e9/speed, bytes_per_clock,
+        ifg=ifg, name="eth_mac_1g_gmii_fifo", params={'speed': speed})
+    await mac_bench.run_rx_bench(tb.gmii_phy.rx, tb.axis_sink, GmiiFrame, bytes_per_clock*8e9/speed, bytes_per_clock,
+        ifg=ifg, name="eth_mac_1g_gmii_fifo", params={'speed': speed})
+
+
 def size_list():
     return list(range(60, 128)) + [512, 1514] + [60]*10
 
@@ -164,7 +190,14 @@ def cycle_en():
     return itertools.cycle([0, 0, 0, 1])
 
 
-if cocotb.SIM_NAME:
+if cocotb.SIM_NAME and os.getenv("MAC_BENCH"):
+
+    factory = TestFactory(run_bench)
+    factory.add_option("ifg", [12])
+    factory.add_option("speed", [1000e6])
+    factory.generate_tests()
+
+elif cocotb.SIM_NAME:
 
     for test in [run_test_rx, run_test_tx]:
 
@@ -184,7 +217,8 @@ lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'axis', 'rtl'))
 
 
-def test_eth_mac_1g_gmii_fifo(request):
+@pytest.mark.simulator("verilator")
+def test_eth_mac_1g_gmii_fifo(request, bench=False):
     dut = "eth_mac_1g_gmii_fifo"
     module = os.path.splitext(os.path.basename(__file__))[0]
     toplevel = dut
@@ -226,6 +260,12 @@ def test_eth_mac_1g_gmii_fifo(request):
     sim_build = os.path.join(tests_dir, "sim_build",
         request.node.name.replace('[', '-').replace(']', ''))
 
+    if bench:
+        extra_env['MAC_BENCH'] = '1'
+        extra_env['MAC_BENCH_FILE'] = os.path.join(sim_build, "mac_bench.json")
+        if os.path.exists(extra_env['MAC_BENCH_FILE']):
+            os.remove(extra_env['MAC_BENCH_FILE'])
+
     cocotb_test.simulator.run(
         python_search=[tests_dir],
         verilog_sources=verilog_sources,
@@ -235,3 +275,9 @@ def test_eth_mac_1g_gmii_fifo(request):
         sim_build=sim_build,
         extra_env=extra_env,
     )
+
+
+@pytest.mark.simulator("verilator")
+@pytest.mark.benchmark
+def test_eth_mac_1g_gmii_fifo_bench(request):
+    test_eth_mac_1g_gmii_fifo(request, bench=True)
@@ -27,12 +27,15 @@ import itertools
 import logging
 import os
 
+import pytest
 import cocotb_test.simulator
 
 import cocotb
 from cocotb.triggers import RisingEdge, Timer
 from cocotb.regression import TestFactory
 
+import mac_bench
+
 from cocotbext.eth import GmiiFrame, RgmiiPhy
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
 
@@ -155,6 +158,27 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None, ifg=12, spee
     await RisingEdge(dut.tx_clk)
 
 
+async def run_bench(dut, ifg=12, speed=1000e6):
+
+    tb = TB(dut, speed)
+
+    tb.rgmii_phy.rx.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    # wait for link speed detection
+    for k in range(100):
+        await RisingEdge(dut.rx_clk)
+
+    # RGMII transfers a byte per clock at 1000 Mbps, a nibble per clock otherwise
+    bytes_per_clock = 1 if speed == 1000e6 else 0.5
+    await mac_bench.run_tx_bench(tb.axis_source, tb.rgmii_phy.tx, bytes_per_clock*8e9/speed, bytes_per_clock,
+        ifg=ifg, name="eth_mac_1g_rgmii", params={'speed': speed})
+    await mac_bench.run_rx_bench(tb.rgmii_phy.rx, tb.axis_sink, GmiiFrame, bytes_per_clock*8e9/speed, bytes_per_clock,
+        ifg=ifg, name="eth_mac_1g_rgmii", params={'speed': speed})
+
+
 def size_list():
     return list(range(60, 128)) + [512, 1514] + [60]*10
 
@@ -167,7 +191,14 @@ def cycle_en():
     return itertools.cycle([0, 0, 0, 1])
 
 
-if cocotb.SIM_NAME:
+if cocotb.SIM_NAME and os.getenv("MAC_BENCH"):
+
+    factory = TestFactory(run_bench)
+    factory.add_option("ifg", [12])
+    factory.add_option("speed", [1000e6])
+    factory.generate_tests()
+
+elif cocotb.SIM_NAME:
 
     for test in [run_test_rx, run_test_tx]:
 
@@ -187,7 +218,8 @@ lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'axis', 'rtl'))
 
 
-def test_eth_mac_1g_rgmii(request):
+@pytest.mark.simulator("verilator")
+def test_eth_mac_1g_rgmii(request, bench=False):
     dut = "eth_mac_1g_rgmii"
     module = os.path.splitext(os.path.basename(__file__))[0]
     toplevel = dut
@@ -214,6 +246,12 @@ def test_eth_mac_1g_rgmii(request):
     sim_build = os.path.join(tests_dir, "sim_build",
         request.node.name.replace('[', '-').replace(']', ''))
 
+    if bench:
+        extra_env['MAC_BENCH'] = '1'
+        extra_env['MAC_BENCH_FILE'] = os.path.join(sim_build, "mac_bench.json")
+        if os.path.exists(extra_env['MAC_BENCH_FILE']):
+            os.remove(extra_env['MAC_BENCH_FILE'])
+
     cocotb_test.simulator.run(
         python_search=[tests_dir],
         verilog_sources=verilog_sources,
@@ -223,3 +261,9 @@ def test_eth_mac_1g_rgmii(request):
         sim_build=sim_build,
         extra_env=extra_env,
     )
+
+
+@pytest.mark.simulator("verilator")
+@pytest.mark.benchmark
+def test_eth_mac_1g_rgmii_bench(request):
+    test_eth_mac_1g_rgmii(request, bench=True)
@@ -27,12 +27,15 @@ import itertools
 import logging
 import os
 
+import pytest
 import cocotb_test.simulator
 
 import cocotb
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 
+import mac_bench
+
 from cocotbext.eth import GmiiFrame, MiiPhy
 from cocotbext.axi import AxiStreamBus, AxiStreamSource, AxiStreamSink
 
@@ -118,6 +121,22 @@ async def run_test_tx(dut, payload_lengths=None, payload_data=None, ifg=12, spee
     await RisingEdge(dut.tx_clk)
 
 
+async def run_bench(dut, ifg=12, speed=100e6):
+
+    tb = TB(dut, speed)
+
+    tb.mii_phy.rx.ifg = ifg
+    tb.dut.ifg_delay <= ifg
+
+    await tb.reset()
+
+    # MII transfers a nibble per clock
+    await mac_bench.run_tx_bench(tb.axis_source, tb.mii_phy.tx, 4e9/speed, 0.5,
+        ifg=ifg, name="eth_mac_mii", params={'speed': speed})
+    await mac_bench.run_rx_bench(tb.mii_phy.rx, tb.axis_sink, GmiiFrame, 4e9/speed, 0.5,
+        ifg=ifg, name="eth_mac_mii", params={'speed': speed})
+
+
 def size_list():
     return list(range(60, 128)) + [512, 1514] + [60]*10
 
@@ -130,7 +149,14 @@ def cycle_en():
     return itertools.cycle([0, 0, 0, 1])
 
 
-if cocotb.SIM_NAME:
+if cocotb.SIM_NAME and os.getenv("MAC_BENCH"):
+
+    factory = TestFactory(run_bench)
+    factory.add_option("ifg", [12])
+    factory.add_option("speed", [100e6])
+    factory.generate_tests()
+
+elif cocotb.SIM_NAME:
 
     for test in [run_test_rx, run_test_tx]:
 
@@ -150,7 +176,8 @@ lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'axis', 'rtl'))
 
 
-def test_eth_mac_mii(request):
+@pytest.mark.simulator("verilator")
+def test_eth_mac_mii(request, bench=False):
     dut = "eth_mac_mii"
     module = os.path.splitext(os.path.basename(__file__))[0]
     toplevel = dut
@@ -175,6 +202,12 @@ def test_eth_mac_mii(request):
     sim_build = os.path.join(tests_dir, "sim_build",
         request.node.name.replace('[', '-').replace(']', ''))
 
+    if bench:
+        extra_env['MAC_BENCH'] = '1'
+        extra_env['MAC_BENCH_FILE'] = os.path.join(sim_build, "mac_bench.json")
+        if os.path.exists(extra_env['MAC_BENCH_FILE']):
+            os.remove(extra_env['MAC_BENCH_FILE'])
+
     cocotb_test.simulator.run(
         python_search=[tests_dir],
         verilog_sources=verilog_sources,
@@ -184,3 +217,9 @@ def test_eth_mac_mii(request):
         sim_build=sim_build,
         extra_env=extra_env,
     )
+
+
+@pytest.mark.simulator("verilator")
+@pytest.mark.benchmark
+def test_eth_mac_mii_bench(request):
+    test_eth_mac_mii(request, bench=True)
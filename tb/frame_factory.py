@@ -0,0 +1,295 @@
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import itertools
+import struct
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from inet_checksum import checksum_sum, checksum_fold, checksum_update
+
+# Ethernet + IPv4 + UDP header
+hdr = struct.Struct('>HLHLHBBHHHBBHLLHHHH')
+
+HDR_LEN = hdr.size
+
+# field offsets within the header
+IP_LENGTH_OFFSET = 16
+IP_IDENTIFICATION_OFFSET = 18
+IP_TTL_OFFSET = 22
+IP_CHECKSUM_OFFSET = 24
+IP_SOURCE_IP_OFFSET = 26
+IP_DEST_IP_OFFSET = 30
+UDP_SOURCE_PORT_OFFSET = 34
+UDP_DEST_PORT_OFFSET = 36
+UDP_LENGTH_OFFSET = 38
+UDP_CHECKSUM_OFFSET = 40
+
+PATTERN = bytes(range(256))*64
+
+def incrementing_payload(k, length):
+    """
+    Default payload pattern, matching the incrementing payload_data()
+    used by the tests
+    """
+    if length <= len(PATTERN):
+        return PATTERN[:length]
+    return bytes(itertools.islice(itertools.cycle(range(256)), length))
+
+def field_values(value, count):
+    """
+    Per-frame values from a constant, a callable taking the frame index,
+    or a sequence or iterator
+    """
+    if isinstance(value, int):
+        return [value]*count
+    if callable(value):
+        return [value(k) for k in range(count)]
+    values = list(itertools.islice(value, count))
+    if len(values) < count:
+        raise ValueError("Field generator ran out after %d of %d frames" % (len(values), count))
+    return values
+
+
+class FrameFactory(object):
+    """
+    Bulk Ethernet/IPv4/UDP frame generator
+
+    The constructor arguments form the header template.  generate() takes
+    the frame count and per-frame payload lengths and optionally
+    per-frame values for ip_identification, ip_ttl, ip_source_ip,
+    ip_dest_ip, udp_source_port and udp_dest_port.  Each of these may be
+    a constant, a callable taking the frame index, or an iterable.  All
+    frames are written into one contiguous buffer, with NumPy used to
+    patch the header fields and compute the checksums when it is
+    available.  Frames come out without FCS unless requested, ready for
+    AXIStreamSource.send() or the cocotbext AxiStreamFrame and
+    XgmiiFrame.from_payload().
+    """
+    fields = ('ip_identification', 'ip_ttl', 'ip_source_ip', 'ip_dest_ip', 'udp_source_port', 'udp_dest_port')
+
+    def __init__(self,
+                eth_dest_mac=0xDAD1D2D3D4D5,
+                eth_src_mac=0x5A5152535455,
+                eth_type=0x0800,
+                ip_dscp=0,
+                ip_ecn=0,
+                ip_identification=0,
+                ip_flags=2,
+                ip_fragment_offset=0,
+                ip_ttl=64,
+                ip_protocol=0x11,
+                ip_source_ip=0xc0a80164,
+                ip_dest_ip=0xc0a80165,
+                udp_source_port=1,
+                udp_dest_port=2,
+                udp_checksum=True
+            ):
+
+        self.eth_dest_mac = eth_dest_mac
+        self.eth_src_mac = eth_src_mac
+        self.eth_type = eth_type
+        self.ip_dscp = ip_dscp
+        self.ip_ecn = ip_ecn
+        self.ip_identification = ip_identification
+        self.ip_flags = ip_flags
+        self.ip_fragment_offset = ip_fragment_offset
+        self.ip_ttl = ip_ttl
+        self.ip_protocol = ip_protocol
+        self.ip_source_ip = ip_source_ip
+        self.ip_dest_ip = ip_dest_ip
+        self.udp_source_port = udp_source_port
+        self.udp_dest_port = udp_dest_port
+        self.udp_checksum = udp_checksum
+
+    def template(self):
+        """
+        Header for an empty payload with the template field values and the
+        IP header checksum filled in
+        """
+        buf = bytearray(HDR_LEN)
+        hdr.pack_into(buf, 0,
+            self.eth_dest_mac >> 32, self.eth_dest_mac & 0xffffffff,
+            self.eth_src_mac >> 32, self.eth_src_mac & 0xffffffff,
+            self.eth_type,
+            0x45,
+            self.ip_dscp << 2 | self.ip_ecn,
+            28,
+            self.ip_identification,
+            self.ip_flags << 13 | self.ip_fragment_offset,
+            self.ip_ttl,
+            self.ip_protocol,
+            0,
+            self.ip_source_ip,
+            self.ip_dest_ip,
+            self.udp_source_port,
+            self.udp_dest_port,
+            8,
+            0
+        )
+        cksum = ~checksum_fold(checksum_sum(memoryview(buf)[14:34])) & 0xffff
+        struct.pack_into('>H', buf, IP_CHECKSUM_OFFSET, cksum)
+        return buf
+
+    def generate_buffer(self, count, payload_len, payload=incrementing_payload, **kwargs):
+        """
+        Generate count frames into one buffer; returns the buffer and
+        lists of frame offsets and lengths.  Frames start on even offsets.
+        """
+        for name in kwargs:
+            if name not in self.fields:
+                raise TypeError("Unsupported per-frame field '%s'" % name)
+
+        lengths = field_values(payload_len, count)
+        values = {}
+        for name in self.fields:
+            values[name] = field_values(kwargs.get(name, getattr(self, name)), count)
+
+        offsets = []
+        offset = 0
+        for l in lengths:
+            offsets.append(offset)
+            # pad to even length so the checksum sees a zero pad byte
+            offset += HDR_LEN + l + (l & 1)
+
+        buf = bytearray(offset)
+        template = self.template()
+
+        # payloads are copied in frame by frame
+        for k in range(count):
+            o = offsets[k] + HDR_LEN
+            buf[o:o+lengths[k]] = payload(k, lengths[k])
+
+        if numpy is not None:
+            self._patch_numpy(buf, template, offsets, lengths, values)
+        else:
+            self._patch(buf, template, offsets, lengths, values)
+
+        return buf, offsets, [HDR_LEN+l for l in lengths]
+
+    def generate(self, count, payload_len, payload=incrementing_payload, fcs=False, **kwargs):
+        """
+        Generate count frames as a list of bytes objects
+        """
+        buf, offsets, lengths = self.generate_buffer(count, payload_len, payload, **kwargs)
+
+        mv = memoryview(buf)
+        frames = []
+
+        for o, l in zip(offsets, lengths):
+            f = bytes(mv[o:o+l])
+            if fcs:
+                f += struct.pack('<L', zlib.crc32(f) & 0xffffffff)
+            frames.append(f)
+
+        return frames
+
+    def _patch(self, buf, template, offsets, lengths, values):
+        # patch the template per frame, updating the IP checksum
+        # incrementally from the template checksum
+        t_cksum = struct.unpack_from('>H', template, IP_CHECKSUM_OFFSET)[0]
+        t_ident = self.ip_identification
+        t_ttl = self.ip_ttl << 8 | self.ip_protocol
+        t_src = self.ip_source_ip
+        t_dst = self.ip_dest_ip
+
+        for k in range(len(offsets)):
+            o = offsets[k]
+            l = lengths[k]
+            ident = values['ip_identification'][k]
+            ttl = values['ip_ttl'][k] << 8 | self.ip_protocol
+            src = values['ip_source_ip'][k]
+            dst = values['ip_dest_ip'][k]
+
+            buf[o:o+HDR_LEN] = template
+
+            cksum = checksum_update(t_cksum, 28, l+28)
+            cksum = checksum_update(cksum, t_ident, ident)
+            cksum = checksum_update(cksum, t_ttl, ttl)
+            cksum = checksum_update(cksum, t_src >> 16, src >> 16)
+            cksum = checksum_update(cksum, t_src & 0xffff, src & 0xffff)
+            cksum = checksum_update(cksum, t_dst >> 16, dst >> 16)
+            cksum = checksum_update(cksum, t_dst & 0xffff, dst & 0xffff)
+
+            struct.pack_into('>HH', buf, o+IP_LENGTH_OFFSET, l+28, ident)
+            struct.pack_into('>BBHLLHHHH', buf, o+IP_TTL_OFFSET,
+                ttl >> 8, self.ip_protocol, cksum, src, dst,
+                values['udp_source_port'][k], values['udp_dest_port'][k], l+8, 0)
+
+            if self.udp_checksum:
+                cksum = (src >> 16) + (src & 0xffff) + (dst >> 16) + (dst & 0xffff) + self.ip_protocol + l+8
+                cksum = checksum_sum(memoryview(buf)[o+UDP_SOURCE_PORT_OFFSET:o+HDR_LEN+l], cksum)
+                cksum = ~checksum_fold(cksum) & 0xffff
+                # a computed checksum of zero is sent as all ones (RFC 768)
+                struct.pack_into('>H', buf, o+UDP_CHECKSUM_OFFSET, cksum or 0xffff)
+
+    def _patch_numpy(self, buf, template, offsets, lengths, values):
+        a = numpy.frombuffer(buf, dtype=numpy.uint8)
+        o = numpy.array(offsets, dtype=numpy.int64)
+        l = numpy.array(lengths, dtype=numpy.int64)
+
+        # template header into every frame
+        a[o[:, None] + numpy.arange(HDR_LEN)] = numpy.frombuffer(bytes(template), dtype=numpy.uint8)
+
+        def put(offset, v, width):
+            for i in range(width):
+                a[o+offset+i] = (v >> (8*(width-1-i))) & 0xff
+
+        src = numpy.array(values['ip_source_ip'], dtype=numpy.int64)
+        dst = numpy.array(values['ip_dest_ip'], dtype=numpy.int64)
+
+        put(IP_LENGTH_OFFSET, l+28, 2)
+        put(IP_IDENTIFICATION_OFFSET, numpy.array(values['ip_identification'], dtype=numpy.int64), 2)
+        put(IP_TTL_OFFSET, numpy.array(values['ip_ttl'], dtype=numpy.int64), 1)
+        put(IP_SOURCE_IP_OFFSET, src, 4)
+        put(IP_DEST_IP_OFFSET, dst, 4)
+        put(UDP_SOURCE_PORT_OFFSET, numpy.array(values['udp_source_port'], dtype=numpy.int64), 2)
+        put(UDP_DEST_PORT_OFFSET, numpy.array(values['udp_dest_port'], dtype=numpy.int64), 2)
+        put(UDP_LENGTH_OFFSET, l+8, 2)
+        put(IP_CHECKSUM_OFFSET, numpy.zeros_like(o), 2)
+
+        # all frames start on even offsets, so one word view covers every header
+        w = a.view('>u2').astype(numpy.int64)
+
+        def fold(s):
+            for i in range(3):
+                s = (s & 0xffff) + (s >> 16)
+            return ~s & 0xffff
+
+        ip_words = w[(o[:, None] + 14)//2 + numpy.arange(10)]
+        put(IP_CHECKSUM_OFFSET, fold(ip_words.sum(axis=1)), 2)
+
+        if self.udp_checksum:
+            # per frame sums over the UDP header and payload from a running sum;
+            # the even-length padding supplies the zero pad byte
+            cs = numpy.concatenate(([0], numpy.cumsum(w)))
+            s = cs[(o+HDR_LEN+l+1)//2] - cs[(o+UDP_SOURCE_PORT_OFFSET)//2]
+            s += (src >> 16) + (src & 0xffff) + (dst >> 16) + (dst & 0xffff) + self.ip_protocol + l+8
+            cksum = fold(s)
+            # a computed checksum of zero is sent as all ones (RFC 768)
+            put(UDP_CHECKSUM_OFFSET, numpy.where(cksum == 0, 0xffff, cksum), 2)
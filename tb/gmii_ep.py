@@ -24,7 +24,11 @@ THE SOFTWARE.
 
 from myhdl import *
 
+import axis_ep
+
 class GMIIFrame(object):
+    __slots__ = ('data', 'error')
+
     def __init__(self, data=b'', error=None):
         self.data = b''
         self.error = None
@@ -83,12 +87,15 @@ class GMIIFrame(object):
 
 
 class GMIISource(object):
-    def __init__(self):
+    def __init__(self, idle_sleep=False):
         self.has_logic = False
         self.queue = []
+        self.idle_sleep = idle_sleep
+        self.sleep = axis_ep.IdleSleep()
 
     def send(self, frame):
         self.queue.append(GMIIFrame(frame))
+        self.sleep.notify()
 
     def count(self):
         return len(self.queue)
@@ -120,8 +127,16 @@ class GMIISource(object):
             er = []
             ifg_cnt = 0
 
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
+
+                idle = False
 
                 if rst:
                     frame = None
@@ -171,6 +186,7 @@ class GMIISource(object):
                         txd.next = 0
                         tx_er.next = 0
                         tx_en.next = 0
+                        idle = True
 
         return instances()
 
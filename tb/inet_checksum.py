@@ -0,0 +1,73 @@
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import array
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# minimum length for NumPy checksum summation
+numpy_checksum_threshold = 4096
+
+def checksum_sum(data, cksum=0):
+    """
+    Add data to an unfolded one's complement sum as 16 bit big endian
+    words; an odd trailing byte is padded with zero
+    """
+    if type(data) not in (bytes, bytearray, memoryview):
+        data = bytes(data)
+
+    n = len(data) & ~1
+
+    if numpy is not None and n >= numpy_checksum_threshold:
+        cksum += int(numpy.frombuffer(data, dtype='>u2', count=n//2).sum(dtype=numpy.uint64))
+    else:
+        words = array.array('H')
+        words.frombytes(memoryview(data)[:n])
+        if sys.byteorder == 'little':
+            words.byteswap()
+        cksum += sum(words)
+
+    if len(data) & 1:
+        cksum += data[-1] << 8
+
+    return cksum
+
+def checksum_fold(cksum):
+    """
+    Fold a one's complement sum to 16 bits
+    """
+    while cksum >> 16:
+        cksum = (cksum & 0xffff) + (cksum >> 16)
+    return cksum
+
+def checksum_update(cksum, old, new):
+    """
+    Incremental update of a 16 bit one's complement checksum when a 16 bit
+    word changes from old to new (RFC 1624, eqn. 3)
+    """
+    return ~checksum_fold((~cksum & 0xffff) + (~old & 0xffff) + new) & 0xffff
@@ -24,10 +24,32 @@ THE SOFTWARE.
 
 from myhdl import *
 import axis_ep
+from collections import deque
 import eth_ep
+from inet_checksum import checksum_fold
 import struct
 
+ip_hdr = struct.Struct('>BBHHHBBHLL')
+
+IP_HDR_LEN = ip_hdr.size
+
+def pack_ip_header(buf, offset, frame):
+    ip_hdr.pack_into(buf, offset,
+        frame.ip_version << 4 | frame.ip_ihl,
+        frame.ip_dscp << 2 | frame.ip_ecn,
+        frame.ip_length,
+        frame.ip_identification,
+        frame.ip_flags << 13 | frame.ip_fragment_offset,
+        frame.ip_ttl,
+        frame.ip_protocol,
+        frame.ip_header_checksum,
+        frame.ip_source_ip,
+        frame.ip_dest_ip
+    )
+
 class IPFrame(object):
+    __slots__ = ('_payload', 'eth_dest_mac', 'eth_src_mac', 'eth_type', 'ip_version', 'ip_ihl', 'ip_dscp', 'ip_ecn', 'ip_length', 'ip_identification', 'ip_flags', 'ip_fragment_offset', 'ip_ttl', 'ip_protocol', 'ip_header_checksum', 'ip_source_ip', 'ip_dest_ip')
+
     def __init__(self,
                 payload=b'',
                 eth_dest_mac=0,
@@ -48,7 +70,6 @@ class IPFrame(object):
                 ip_dest_ip=0xc0a80165
             ):
 
-        self._payload = axis_ep.AXIStreamFrame()
         self.eth_dest_mac = eth_dest_mac
         self.eth_src_mac = eth_src_mac
         self.eth_type = eth_type
@@ -67,7 +88,7 @@ class IPFrame(object):
         self.ip_dest_ip = ip_dest_ip
 
         if type(payload) is dict:
-            self.payload = axis_ep.AXIStreamFrame(payload['ip_payload'])
+            self._payload = axis_ep.AXIStreamFrame(payload['ip_payload'])
             self.eth_dest_mac = payload['eth_dest_mac']
             self.eth_src_mac = payload['eth_src_mac']
             self.eth_type = payload['eth_type']
@@ -84,12 +105,10 @@ class IPFrame(object):
             self.ip_header_checksum = payload['ip_header_checksum']
             self.ip_source_ip = payload['ip_source_ip']
             self.ip_dest_ip = payload['ip_dest_ip']
-        if type(payload) is bytes:
-            payload = bytearray(payload)
-        if type(payload) is bytearray or type(payload) is axis_ep.AXIStreamFrame:
-            self.payload = axis_ep.AXIStreamFrame(payload)
-        if type(payload) is IPFrame:
-            self.payload = axis_ep.AXIStreamFrame(payload.payload)
+        elif type(payload) in (bytes, bytearray, axis_ep.AXIStreamFrame):
+            self._payload = axis_ep.AXIStreamFrame(payload)
+        elif type(payload) is IPFrame:
+            self._payload = axis_ep.AXIStreamFrame(payload._payload)
             self.eth_dest_mac = payload.eth_dest_mac
             self.eth_src_mac = payload.eth_src_mac
             self.eth_type = payload.eth_type
@@ -106,6 +125,8 @@ class IPFrame(object):
             self.ip_header_checksum = payload.ip_header_checksum
             self.ip_source_ip = payload.ip_source_ip
             self.ip_dest_ip = payload.ip_dest_ip
+        else:
+            self._payload = axis_ep.AXIStreamFrame()
 
     @property
     def payload(self):
@@ -116,7 +137,7 @@ class IPFrame(object):
         self._payload = axis_ep.AXIStreamFrame(value)
 
     def update_length(self):
-        self.ip_length = len(self.payload.data) + 20
+        self.ip_length = self.payload.length() + 20
 
     def calc_checksum(self):
         cksum = self.ip_version << 12 | self.ip_ihl << 8 | self.ip_dscp << 2 | self.ip_ecn
@@ -128,9 +149,7 @@ class IPFrame(object):
         cksum += (self.ip_source_ip >> 16) & 0xffff
         cksum += self.ip_dest_ip & 0xffff
         cksum += (self.ip_dest_ip >> 16) & 0xffff
-        cksum = (cksum & 0xffff) + (cksum >> 16)
-        cksum = (cksum & 0xffff) + (cksum >> 16)
-        return ~cksum & 0xffff
+        return ~checksum_fold(cksum) & 0xffff
 
     def update_checksum(self):
         self.ip_header_checksum = self.calc_checksum()
@@ -144,27 +163,29 @@ class IPFrame(object):
         if self.ip_header_checksum is None:
             self.update_checksum()
 
+    def build_bytes(self):
+        # Ethernet and IP headers and payload written straight into a single buffer
+        self.build()
+        offset = eth_ep.ETH_HDR_LEN + IP_HDR_LEN
+        buf = bytearray(offset + self.payload.length())
+
+        eth_ep.pack_eth_header(buf, 0, self)
+        pack_ip_header(buf, eth_ep.ETH_HDR_LEN, self)
+        self.payload.write_into(buf, offset)
+
+        return buf
+
     def build_axis(self):
-        return self.build_eth().build_axis()
+        return axis_ep.AXIStreamFrame.from_buffer(self.build_bytes())
 
     def build_eth(self):
         self.build()
-        data = b''
+        buf = bytearray(IP_HDR_LEN + self.payload.length())
 
-        data += struct.pack('B', self.ip_version << 4 | self.ip_ihl)
-        data += struct.pack('B', self.ip_dscp << 2 | self.ip_ecn)
-        data += struct.pack('>H', self.ip_length)
-        data += struct.pack('>H', self.ip_identification)
-        data += struct.pack('>H', self.ip_flags << 13 | self.ip_fragment_offset)
-        data += struct.pack('B', self.ip_ttl)
-        data += struct.pack('B', self.ip_protocol)
-        data += struct.pack('>H', self.ip_header_checksum)
-        data += struct.pack('>L', self.ip_source_ip)
-        data += struct.pack('>L', self.ip_dest_ip)
+        pack_ip_header(buf, 0, self)
+        self.payload.write_into(buf, IP_HDR_LEN)
 
-        data += self.payload.data
-
-        return eth_ep.EthFrame(data, self.eth_dest_mac, self.eth_src_mac, self.eth_type)
+        return eth_ep.EthFrame(axis_ep.AXIStreamFrame.from_buffer(buf), self.eth_dest_mac, self.eth_src_mac, self.eth_type)
 
     def parse_axis(self, data):
         frame = eth_ep.EthFrame()
@@ -241,11 +262,13 @@ class IPFrame(object):
 
 
 class IPFrameSource():
-    def __init__(self):
+    def __init__(self, idle_sleep=False):
         self.active = False
         self.has_logic = False
         self.queue = []
-        self.payload_source = axis_ep.AXIStreamSource()
+        self.payload_source = axis_ep.AXIStreamSource(idle_sleep=idle_sleep)
+        self.idle_sleep = idle_sleep
+        self.sleep = axis_ep.IdleSleep()
         self.header_queue = []
         self.clk = Signal(bool(0))
 
@@ -256,6 +279,7 @@ class IPFrameSource():
             self.payload_source.send(frame.payload)
         else:
             self.queue.append(frame)
+        self.sleep.notify()
 
     def count(self):
         return len(self.queue)
@@ -321,12 +345,19 @@ class IPFrameSource():
 
         @instance
         def logic():
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
 
                 if rst:
                     ip_hdr_valid.next = False
                     self.active = False
+                    idle = False
                 else:
                     ip_hdr_valid.next = self.active and (ip_hdr_valid or not pause)
                     if ip_hdr_ready and ip_hdr_valid:
@@ -363,20 +394,32 @@ class IPFrameSource():
                         self.header_queue.append(frame)
                         self.payload_source.send(frame.payload)
 
+                    idle = not self.active and not self.header_queue and not self.queue
+
         return instances()
 
 
 class IPFrameSink():
-    def __init__(self):
+    def __init__(self, callback=None, expected=None, maxlen=None):
         self.has_logic = False
-        self.queue = []
+        self.queue = deque()
         self.payload_sink = axis_ep.AXIStreamSink()
-        self.header_queue = []
+        self.header_queue = deque()
         self.sync = Signal(intbv(0))
+        self.scoreboard = axis_ep.FrameScoreboard()
+        if callback is not None or expected is not None or maxlen is not None:
+            self.stream(callback, expected, maxlen)
+
+    def stream(self, callback=None, expected=None, maxlen=None):
+        if maxlen is None:
+            maxlen = axis_ep.stream_queue_len
+        self.scoreboard = axis_ep.FrameScoreboard(callback, expected)
+        self.queue = deque(self.queue, maxlen=maxlen)
+        return self.scoreboard
 
     def recv(self):
         if self.queue:
-            return self.queue.pop(0)
+            return self.queue.popleft()
         return None
 
     def count(self):
@@ -482,9 +525,10 @@ class IPFrameSink():
                         self.header_queue.append(frame)
 
                     if not self.payload_sink.empty() and self.header_queue:
-                        frame = self.header_queue.pop(0)
+                        frame = self.header_queue.popleft()
                         frame.payload = self.payload_sink.recv()
                         self.queue.append(frame)
+                        self.scoreboard.receive(frame, frame.payload.length())
                         self.sync.next = not self.sync
 
                         if name is not None:
@@ -0,0 +1,296 @@
+"""
+
+Copyright (c) 2020 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+# Cut-through latency measurement
+#
+# For each frame, the time the first beat is offered to the DUT (tvalid on
+# the input stream, or the XGMII start character) is matched in order
+# against the first and last beats leaving it.  LatencyStats collects the
+# samples per path, configuration and frame size and reports min, mean,
+# p99 and max in cycles of a reference clock and in ns.  Frame size is the
+# byte count on the AXI stream side of the path.  LatencyStats has no
+# simulator dependencies and is shared with the MyHDL monitor in
+# latency_ep.py; LatencyProbe is the cocotb monitor.
+
+import json
+import logging
+import math
+import os
+from collections import deque
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.utils import get_sim_time
+except ImportError:
+    cocotb = None
+
+XGMII_START = 0xfb
+XGMII_TERM = 0xfd
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    if not values:
+        return None
+    return values[max(int(math.ceil(p / 100.0 * len(values))) - 1, 0)]
+
+
+def describe(values):
+    values = sorted(values)
+    return {
+        'min': values[0],
+        'mean': sum(values) / float(len(values)),
+        'p99': percentile(values, 99),
+        'max': values[-1],
+    }
+
+
+class LatencyStats(object):
+    """
+    Latency samples in cycles, keyed by path, configuration and frame size
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.periods = {}
+        self.configs = {}
+
+    def add(self, path, size, first, last, period_ns, config=None):
+        config = dict(config or {})
+        key = (path, tuple(sorted(config.items())), size)
+        self.samples.setdefault(key, []).append((first, last))
+        self.periods[key] = period_ns
+        self.configs[key] = config
+
+    def summary(self):
+        rows = []
+
+        for key in sorted(self.samples, key=lambda k: (k[0], k[1], k[2] or 0)):
+            path, _, size = key
+            period = self.periods[key]
+            first = [s[0] for s in self.samples[key]]
+            last = [s[1] for s in self.samples[key]]
+
+            row = {
+                'path': path,
+                'config': self.configs[key],
+                'frame_size': size,
+                'count': len(first),
+                'period_ns': period,
+                'first_cycles': describe(first),
+                'last_cycles': describe(last),
+            }
+            row['first_ns'] = {k: v * period for k, v in row['first_cycles'].items()}
+            row['last_ns'] = {k: v * period for k, v in row['last_cycles'].items()}
+
+            rows.append(row)
+
+        return rows
+
+    def format_summary(self):
+        lines = []
+
+        for row in self.summary():
+            f = row['first_cycles']
+            l = row['last_cycles']
+            lines.append("%s %s %5s bytes: first beat %.1f/%.1f/%.1f/%.1f, last beat %.1f/%.1f/%.1f/%.1f cycles (min/mean/p99/max, %g ns/cycle)" % (
+                row['path'], row['config'] or '', row['frame_size'],
+                f['min'], f['mean'], f['p99'], f['max'],
+                l['min'], l['mean'], l['p99'], l['max'], row['period_ns']))
+
+        return lines
+
+    def log_summary(self, log=None):
+        log = log or logging.getLogger("cocotb.tb")
+
+        for line in self.format_summary():
+            log.info("%s", line)
+
+    def write(self, filename=None):
+        """
+        Append the summary to filename, LATENCY_FILE or latency.json
+        """
+        filename = filename or os.getenv("LATENCY_FILE", "latency.json")
+
+        try:
+            with open(filename) as f:
+                existing = json.load(f)
+        except (OSError, IOError, ValueError):
+            existing = []
+
+        with open(filename, "w") as f:
+            json.dump(existing + self.summary(), f, indent=2)
+
+        return filename
+
+
+def _int(handle):
+    try:
+        return handle.value.integer
+    except ValueError:
+        return 0
+
+
+def _keep_bytes(tkeep):
+    return bin(_int(tkeep)).count('1') if tkeep is not None else 1
+
+
+def _xgmii_lanes(d, c, lanes, char):
+    """
+    Lanes holding control character char
+    """
+    return [i for i in range(lanes) if c & (1 << i) and (d >> (8*i)) & 0xff == char]
+
+
+class LatencyProbe(object):
+    """
+    cocotb latency monitor for one path through a DUT
+
+    Attach one input and one output with input_axis/input_xgmii and
+    output_axis/output_xgmii.  Frames must leave in the order they enter,
+    so only send traffic that the DUT forwards while the probe is running.
+    Latencies are converted to cycles of period_ns.
+    """
+
+    def __init__(self, stats, path, period_ns, config=None):
+        self.stats = stats
+        self.path = path
+        self.period_ns = period_ns
+        self.config = config
+
+        self.pending = deque()
+        self.tasks = []
+
+    def input_axis(self, clock, tvalid, tready, tlast, tkeep=None):
+        self.tasks.append(cocotb.fork(self._input_axis(clock, tvalid, tready, tlast, tkeep)))
+
+    def input_xgmii(self, clock, xgmii_d, xgmii_c):
+        self.tasks.append(cocotb.fork(self._input_xgmii(clock, xgmii_d, xgmii_c)))
+
+    def output_axis(self, clock, tvalid, tready, tlast, tkeep=None):
+        self.tasks.append(cocotb.fork(self._output_axis(clock, tvalid, tready, tlast, tkeep)))
+
+    def output_xgmii(self, clock, xgmii_d, xgmii_c):
+        self.tasks.append(cocotb.fork(self._output_xgmii(clock, xgmii_d, xgmii_c)))
+
+    def stop(self):
+        for task in self.tasks:
+            task.kill()
+        self.tasks = []
+
+    def _start(self, t):
+        rec = {'start': t, 'size': None, 'first': None}
+        self.pending.append(rec)
+        return rec
+
+    def _finish(self, rec, t, size=None):
+        if rec['size'] is None:
+            rec['size'] = size
+        self.stats.add(self.path, rec['size'],
+            (rec['first'] - rec['start']) / self.period_ns,
+            (t - rec['start']) / self.period_ns,
+            self.period_ns, self.config)
+
+    async def _input_axis(self, clock, tvalid, tready, tlast, tkeep):
+        rec = None
+        size = 0
+
+        while True:
+            await RisingEdge(clock)
+
+            if not _int(tvalid):
+                continue
+
+            if rec is None:
+                rec = self._start(get_sim_time('ns'))
+                size = 0
+
+            if tready is None or _int(tready):
+                size += _keep_bytes(tkeep)
+                if _int(tlast):
+                    rec['size'] = size
+                    rec = None
+
+    async def _input_xgmii(self, clock, xgmii_d, xgmii_c):
+        lanes = len(xgmii_c)
+
+        while True:
+            await RisingEdge(clock)
+
+            if _xgmii_lanes(_int(xgmii_d), _int(xgmii_c), lanes, XGMII_START):
+                self._start(get_sim_time('ns'))
+
+    async def _output_axis(self, clock, tvalid, tready, tlast, tkeep):
+        rec = None
+        size = 0
+
+        while True:
+            await RisingEdge(clock)
+
+            if not _int(tvalid) or not (tready is None or _int(tready)):
+                continue
+
+            t = get_sim_time('ns')
+
+            if rec is None:
+                if not self.pending:
+                    continue
+                rec = self.pending.popleft()
+                rec['first'] = t
+                size = 0
+
+            size += _keep_bytes(tkeep)
+
+            if _int(tlast):
+                self._finish(rec, t, size)
+                rec = None
+
+    async def _output_xgmii(self, clock, xgmii_d, xgmii_c):
+        lanes = len(xgmii_c)
+        rec = None
+        prev = None
+
+        while True:
+            await RisingEdge(clock)
+
+            t = get_sim_time('ns')
+            d = _int(xgmii_d)
+            c = _int(xgmii_c)
+
+            if rec is not None:
+                term = _xgmii_lanes(d, c, lanes, XGMII_TERM)
+                if term:
+                    # terminate in lane 0 follows the last data beat
+                    self._finish(rec, prev if term[0] == 0 else t)
+                    rec = None
+
+            # with DIC the next start can share a cycle with the terminate
+            if rec is None and self.pending and _xgmii_lanes(d, c, lanes, XGMII_START):
+                rec = self.pending.popleft()
+                rec['first'] = t
+
+            prev = t
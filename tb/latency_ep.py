@@ -0,0 +1,133 @@
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+from myhdl import *
+from collections import deque
+
+from latency import LatencyStats
+
+# payload sizes for latency sweeps
+payload_sizes = [18, 64, 128, 256, 512, 1024, 1472]
+frame_count = 16
+
+def keep_bytes(keep):
+    if keep is None:
+        return 1
+    return bin(int(keep)).count('1')
+
+class LatencyMonitor(object):
+    """
+    Passive cut-through latency monitor for one path through a DUT
+
+    Timestamps the first cycle a frame is offered on the input (header
+    valid or payload tvalid) and the first and last beats transferred on
+    the output, in clock cycles.  Frames must leave in the order they
+    enter; hold enable low while other traffic is running.
+    """
+
+    def __init__(self, stats, path, period_ns, config=None):
+        self.has_logic = False
+        self.stats = stats
+        self.path = path
+        self.period_ns = period_ns
+        self.config = config
+
+    def create_logic(self,
+                clk,
+                rst,
+                in_tvalid,
+                in_tready,
+                in_tlast,
+                out_tvalid,
+                out_tready,
+                out_tlast,
+                in_tkeep=None,
+                out_tkeep=None,
+                in_hdr_valid=None,
+                out_hdr_valid=None,
+                out_hdr_ready=None,
+                size_from='in',
+                enable=True,
+                name=None
+            ):
+
+        assert not self.has_logic
+        assert size_from in ('in', 'out')
+
+        self.has_logic = True
+
+        @instance
+        def logic():
+            cycle = 0
+            pending = deque()
+            in_rec = None
+            out_rec = None
+
+            while True:
+                yield clk.posedge, rst.posedge
+
+                if rst:
+                    cycle = 0
+                    pending = deque()
+                    in_rec = None
+                    out_rec = None
+                    continue
+
+                cycle += 1
+
+                if not enable:
+                    continue
+
+                # input side
+                if in_rec is None and (in_tvalid or (in_hdr_valid is not None and in_hdr_valid)):
+                    in_rec = {'start': cycle, 'first': None, 'in': 0, 'out': 0}
+                    pending.append(in_rec)
+
+                if in_rec is not None and in_tvalid and in_tready:
+                    in_rec['in'] += keep_bytes(in_tkeep)
+                    if in_tlast:
+                        in_rec = None
+
+                # output side
+                beat = out_tvalid and out_tready
+                hdr = out_hdr_valid is not None and out_hdr_valid and out_hdr_ready
+
+                if out_rec is None and (beat or hdr) and pending:
+                    out_rec = pending.popleft()
+                    out_rec['first'] = cycle
+
+                if out_rec is not None and beat:
+                    out_rec['out'] += keep_bytes(out_tkeep)
+                    if out_tlast:
+                        self.stats.add(self.path, out_rec[size_from],
+                            out_rec['first'] - out_rec['start'],
+                            cycle - out_rec['start'],
+                            self.period_ns, self.config)
+                        if name is not None:
+                            print("[%s] %d bytes: first beat %d, last beat %d cycles" % (name,
+                                out_rec[size_from], out_rec['first'] - out_rec['start'], cycle - out_rec['start']))
+                        out_rec = None
+
+        return instances()
+
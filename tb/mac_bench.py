@@ -0,0 +1,214 @@
+"""
+
+Copyright (c) 2020 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+# MAC line-rate benchmark
+#
+# RFC 2544 style: for each frame size, a burst of back-to-back frames is
+# queued on the AXI stream side and the start times of the frames on the
+# PHY side give the achieved frame rate; RX sends the burst the other way
+# and times the frames on the AXI stream side.  The theoretical maximum is
+# preamble + frame + IFG bytes per frame at the interface width, rounded
+# up to the start lane alignment when deficit idle count is off.  Results
+# are appended to a JSON file, MAC_BENCH_FILE or mac_bench.json in the
+# simulation directory.
+
+import itertools
+import json
+import logging
+import math
+import os
+
+from cocotb.result import SimTimeoutError
+from cocotb.triggers import with_timeout
+from cocotb.utils import get_time_from_sim_steps
+
+# frame sizes including FCS
+rfc2544_sizes = [64, 128, 256, 512, 1024, 1518, 9214]
+
+PREAMBLE_LEN = 8
+FCS_LEN = 4
+
+log = logging.getLogger("cocotb.tb")
+
+
+def burst_count(size):
+    return max(8, 4096 // size)
+
+
+def wire_bytes(size, ifg=12, lane_align=1, dic=True):
+    """
+    Interface bytes used per frame at line rate
+    """
+    n = PREAMBLE_LEN + size + ifg
+    if lane_align > 1 and not dic:
+        n = math.ceil(n / lane_align) * lane_align
+    return n
+
+
+def max_frames_per_clock(size, bytes_per_clock, ifg=12, lane_align=1, dic=True):
+    return bytes_per_clock / wire_bytes(size, ifg, lane_align, dic)
+
+
+def write_results(results):
+    filename = os.getenv("MAC_BENCH_FILE", "mac_bench.json")
+
+    try:
+        with open(filename) as f:
+            existing = json.load(f)
+    except (OSError, ValueError):
+        existing = []
+
+    with open(filename, "w") as f:
+        json.dump(existing + results, f, indent=2)
+
+    log.info("Benchmark results written to %s", filename)
+
+
+async def run_tx_bench(source, sink, clock_period_ns, bytes_per_clock, ifg=12,
+        lane_align=1, dic=True, sizes=rfc2544_sizes, name=None, params=None):
+    """
+    Drive back-to-back frames into source (AXI stream) and time them at
+    sink (PHY side frames with sim_time_start); returns the result records
+    """
+    results = []
+
+    for size in sizes:
+        count = burst_count(size)
+        payload = bytes(itertools.islice(itertools.cycle(range(256)), size-FCS_LEN))
+
+        for k in range(count):
+            await source.send(payload)
+
+        frames = [await sink.recv() for k in range(count)]
+
+        for frame in frames:
+            assert frame.get_payload() == payload
+            assert frame.check_fcs()
+
+        # skip the first frame, which includes pipeline latency
+        t = [get_time_from_sim_steps(f.sim_time_start, 'ns') for f in frames[1:]]
+        clocks = (t[-1] - t[0]) / clock_period_ns
+        frames_per_clock = (len(t) - 1) / clocks if clocks else 0.0
+
+        max_fpc = max_frames_per_clock(size, bytes_per_clock, ifg, lane_align, dic)
+
+        r = {
+            'name': name,
+            'params': params or {},
+            'direction': 'tx',
+            'frame_size': size,
+            'frames': count,
+            'ifg': ifg,
+            'dic': bool(dic),
+            'clocks': clocks,
+            'frames_per_clock': frames_per_clock,
+            'bytes_per_clock': frames_per_clock * size,
+            'max_frames_per_clock': max_fpc,
+            'max_bytes_per_clock': max_fpc * size,
+            'efficiency': frames_per_clock / max_fpc,
+        }
+
+        log.info("%s tx %5d bytes: %.4f frames/clock, %.3f bytes/clock, %.1f%% of line rate",
+            name, size, r['frames_per_clock'], r['bytes_per_clock'], 100*r['efficiency'])
+
+        results.append(r)
+
+    write_results(results)
+
+    return results
+
+
+async def run_rx_bench(source, sink, frame_type, clock_period_ns, bytes_per_clock, ifg=12,
+        sizes=rfc2544_sizes, name=None, params=None):
+    """
+    Drive back-to-back frames at line rate into source (PHY side), check
+    that all of them come out of sink (AXI stream) intact and time them at
+    sink; returns the result records
+    """
+    results = []
+
+    for size in sizes:
+        count = burst_count(size)
+        payload = bytes(itertools.islice(itertools.cycle(range(256)), size-FCS_LEN))
+
+        # wire time of one frame, with slack for pipeline latency and
+        # store and forward in the FIFO variants
+        frame_ns = wire_bytes(size, ifg) / bytes_per_clock * clock_period_ns
+        timeout_ns = 4*frame_ns + 1000
+
+        source.ifg = ifg
+
+        for k in range(count):
+            await source.send(frame_type.from_payload(payload))
+
+        frames = []
+        ok = 0
+        for k in range(count):
+            try:
+                frame = await with_timeout(sink.recv(), int(math.ceil(timeout_ns)), 'ns')
+            except SimTimeoutError:
+                break
+            frames.append(frame)
+            if frame.tdata == payload and not frame.tuser:
+                ok += 1
+
+        # drop whatever is left so it is not counted for the next size
+        await source.wait()
+        while True:
+            try:
+                await with_timeout(sink.recv(), int(math.ceil(timeout_ns)), 'ns')
+            except SimTimeoutError:
+                break
+
+        # skip the first frame, which includes pipeline latency
+        t = [get_time_from_sim_steps(f.sim_time_start, 'ns') for f in frames[1:]]
+        clocks = (t[-1] - t[0]) / clock_period_ns if len(t) > 1 else 0.0
+        frames_per_clock = (len(t) - 1) / clocks if clocks else 0.0
+
+        max_fpc = max_frames_per_clock(size, bytes_per_clock, ifg)
+
+        r = {
+            'name': name,
+            'params': params or {},
+            'direction': 'rx',
+            'frame_size': size,
+            'frames': count,
+            'ifg': ifg,
+            'frames_ok': ok,
+            'clocks': clocks,
+            'frames_per_clock': frames_per_clock,
+            'bytes_per_clock': frames_per_clock * size,
+            'max_frames_per_clock': max_fpc,
+            'max_bytes_per_clock': max_fpc * size,
+            'efficiency': frames_per_clock / max_fpc,
+        }
+
+        log.info("%s rx %5d bytes: %d of %d frames ok, %.4f frames/clock, %.3f bytes/clock, %.1f%% of line rate",
+            name, size, ok, count, r['frames_per_clock'], r['bytes_per_clock'], 100*r['efficiency'])
+
+        results.append(r)
+
+    write_results(results)
+
+    return results
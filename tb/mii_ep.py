@@ -24,7 +24,11 @@ THE SOFTWARE.
 
 from myhdl import *
 
+import axis_ep
+
 class MIIFrame(object):
+    __slots__ = ('data', 'error')
+
     def __init__(self, data=b'', error=None):
         self.data = b''
         self.error = None
@@ -106,12 +110,15 @@ class MIIFrame(object):
 
 
 class MIISource(object):
-    def __init__(self):
+    def __init__(self, idle_sleep=False):
         self.has_logic = False
         self.queue = []
+        self.idle_sleep = idle_sleep
+        self.sleep = axis_ep.IdleSleep()
 
     def send(self, frame):
         self.queue.append(MIIFrame(frame))
+        self.sleep.notify()
 
     def count(self):
         return len(self.queue)
@@ -142,8 +149,16 @@ class MIISource(object):
             er = []
             ifg_cnt = 0
 
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
+
+                idle = False
 
                 if rst:
                     frame = None
@@ -179,6 +194,7 @@ class MIISource(object):
                         txd.next = 0
                         tx_er.next = 0
                         tx_en.next = 0
+                        idle = True
 
         return logic
 
@@ -26,6 +26,7 @@ THE SOFTWARE.
 import logging
 import os
 
+import pytest
 import cocotb_test.simulator
 
 import cocotb
@@ -343,6 +344,7 @@ lib_dir = os.path.abspath(os.path.join(rtl_dir, '..', 'lib'))
 axis_rtl_dir = os.path.abspath(os.path.join(lib_dir, 'axis', 'rtl'))
 
 
+@pytest.mark.simulator("verilator")
 def test_ptp_clock(request):
     dut = "ptp_clock"
     module = os.path.splitext(os.path.basename(__file__))[0]
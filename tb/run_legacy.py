@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import argparse
+import concurrent.futures
+import fnmatch
+import glob
+import os
+import signal
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# directories holding legacy MyHDL benches, relative to the repository root
+bench_dirs = ['tb', 'lib/axis/tb']
+
+# build outputs from a run, not linked into the work directories
+output_patterns = ['*.vvp', '*.vvp.sha256', '*.lxt', '*.vcd', '*.fst', '__pycache__']
+
+work_root = os.path.join(root, '.legacy_build')
+
+
+def discover(patterns=None):
+    """
+    Find legacy bench scripts, optionally filtered by name patterns
+    """
+    benches = []
+    for d in bench_dirs:
+        for path in sorted(glob.glob(os.path.join(root, d, 'test_*.py'))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+                continue
+            benches.append(path)
+    return benches
+
+
+def bench_id(path):
+    return os.path.relpath(os.path.splitext(path)[0], root).replace(os.sep, '.')
+
+
+def link_dir(src, dst, skip=()):
+    os.makedirs(dst, exist_ok=True)
+    for name in os.listdir(src):
+        if name in skip or any(fnmatch.fnmatch(name, p) for p in output_patterns):
+            continue
+        link = os.path.join(dst, name)
+        if not os.path.lexists(link):
+            os.symlink(os.path.join(src, name), link)
+
+
+def work_dir(path):
+    """
+    Set up an isolated copy of the bench directory built from symlinks
+
+    The bench directory and its parent are mirrored under
+    .legacy_build/<bench>, so relative source paths such as ../rtl still
+    resolve while .vvp and .lxt outputs stay separate per bench.  The
+    directory is kept between runs so cached builds are reused.
+    """
+    bench_dir = os.path.dirname(path)
+    parent = os.path.dirname(bench_dir)
+    base = os.path.join(work_root, bench_id(path))
+
+    link_dir(parent, base, skip=(os.path.basename(bench_dir), '.git', os.path.basename(work_root)))
+    d = os.path.join(base, os.path.basename(bench_dir))
+    link_dir(bench_dir, d)
+
+    return os.path.join(d, os.path.basename(path))
+
+
+def kill_group(p):
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(p.pid, signal.SIGKILL)
+        else:
+            p.kill()
+    except ProcessLookupError:
+        pass
+
+
+def run_bench(path, timeout=None):
+    script = work_dir(path)
+
+    start = time.time()
+    # own session, so a timeout kills the vvp process along with Python
+    p = subprocess.Popen([sys.executable, os.path.basename(script)], cwd=os.path.dirname(script),
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, start_new_session=True)
+    try:
+        output, _ = p.communicate(timeout=timeout)
+        ret = p.returncode
+    except subprocess.TimeoutExpired:
+        kill_group(p)
+        output, _ = p.communicate()
+        ret = None
+    elapsed = time.time() - start
+
+    return {'name': bench_id(path), 'returncode': ret, 'time': elapsed, 'output': output}
+
+
+def write_junit(results, filename):
+    failures = [r for r in results if r['returncode'] != 0]
+
+    suite = ET.Element('testsuite', name='legacy', tests=str(len(results)),
+        failures=str(len(failures)), errors='0', skipped='0',
+        time='%.3f' % sum(r['time'] for r in results))
+
+    for r in results:
+        case = ET.SubElement(suite, 'testcase', classname=r['name'], name='test_bench', time='%.3f' % r['time'])
+        if r['returncode'] is None:
+            ET.SubElement(case, 'failure', message='timeout').text = r['output']
+        elif r['returncode'] != 0:
+            ET.SubElement(case, 'failure', message='exit status %d' % r['returncode']).text = r['output']
+        ET.SubElement(case, 'system-out').text = r['output']
+
+    ET.ElementTree(suite).write(filename, encoding='utf-8', xml_declaration=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the legacy MyHDL testbenches in parallel")
+    parser.add_argument('patterns', nargs='*', help="bench name patterns, e.g. test_udp_* (default: all)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="parallel benches (default: CPU count)")
+    parser.add_argument('--timeout', type=float, default=None, help="per-bench timeout in seconds")
+    parser.add_argument('--junitxml', default=None, help="write JUnit XML results to this file")
+
+    args = parser.parse_args()
+
+    benches = discover(args.patterns)
+    results = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count()) as executor:
+        futures = [executor.submit(run_bench, path, args.timeout) for path in benches]
+        for f in concurrent.futures.as_completed(futures):
+            r = f.result()
+            status = 'PASS' if r['returncode'] == 0 else 'TIMEOUT' if r['returncode'] is None else 'FAIL'
+            print("%-7s %8.2fs  %s" % (status, r['time'], r['name']), flush=True)
+            results.append(r)
+
+    results.sort(key=lambda r: r['name'])
+
+    if args.junitxml:
+        write_junit(results, args.junitxml)
+
+    failed = [r['name'] for r in results if r['returncode'] != 0]
+
+    print("%d passed, %d failed in %.2fs of bench time" % (len(results)-len(failed), len(failed),
+        sum(r['time'] for r in results)))
+
+    for name in failed:
+        print("FAILED %s" % name)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+
+Copyright (c) 2020 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+# Per-test Python profiling
+#
+# Loaded ahead of the test module (MODULE=sim_profile,test_x) when
+# PROFILE=1.  Each cocotb test runs under cProfile; the profiler stays
+# enabled across simulator callbacks, so endpoint models such as
+# XgmiiSource, the test body and cocotb itself are all covered, and time
+# spent in the simulator shows up as the gaps between callbacks.  For
+# each test a <test>.pstats file (for snakeviz, flameprof or gprof2dot)
+# and a <test>.txt summary of the top hotspots are written to
+# SIM_PROFILE_DIR, which defaults to the current directory.
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+
+import cocotb
+
+import sim_stats
+
+profile_enabled = os.getenv("PROFILE", "0") != "0"
+profile_dir = os.getenv("SIM_PROFILE_DIR", ".")
+profile_top = int(os.getenv("PROFILE_TOP", 25))
+
+log = logging.getLogger("cocotb.profile")
+
+profiler = None
+
+
+def begin_test():
+    global profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+
+def end_test(name):
+    global profiler
+
+    if profiler is None:
+        return
+
+    profiler.disable()
+    p, profiler = profiler, None
+
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, name.replace('/', '_'))
+
+    p.dump_stats(base + ".pstats")
+
+    s = io.StringIO()
+    stats = pstats.Stats(p, stream=s)
+    stats.sort_stats('tottime').print_stats(profile_top)
+    stats.sort_stats('cumulative').print_stats(profile_top)
+
+    with open(base + ".txt", "w") as f:
+        f.write(s.getvalue())
+
+    top = sorted(stats.stats.items(), key=lambda x: x[1][2], reverse=True)[:5]
+    log.info("Profile for %s written to %s.pstats; top functions by own time:", name, base)
+    for (filename, line, func), (cc, nc, tt, ct, callers) in top:
+        log.info("  %8.3fs  %s:%d(%s)", tt, os.path.basename(filename), line, func)
+
+
+if profile_enabled and not sim_stats.hook_tests(begin_test, end_test):
+    log.warning("PROFILE: cannot hook cocotb %s test runner, no profiles written",
+        getattr(cocotb, '__version__', '?'))
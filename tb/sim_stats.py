@@ -0,0 +1,190 @@
+"""
+
+Copyright (c) 2020 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+# Simulation throughput instrumentation
+#
+# Loaded ahead of the test module (MODULE=sim_stats,test_x) when
+# SIM_STATS_FILE is set.  Counts GPI callbacks and the time spent in
+# Python inside them, tracks the first Clock started in each test as the
+# primary clock, and writes per-test sim time, wall time, clock cycles and
+# callback counts to SIM_STATS_FILE as JSON.  Edges are not counted, as a
+# monitor on the clock would add callbacks of its own; clock_cycles_est
+# is the sim time divided by the primary clock period.
+#
+# Tests are hooked through private RegressionManager methods, so a
+# warning is logged and nothing is recorded on cocotb versions without
+# them.
+
+import json
+import logging
+import os
+import time
+
+import cocotb
+import cocotb.regression
+from cocotb.clock import Clock
+from cocotb.utils import get_sim_time
+
+try:
+    from cocotb import simulator
+except ImportError:
+    simulator = None
+
+stats_file = os.getenv("SIM_STATS_FILE")
+
+log = logging.getLogger("cocotb.sim_stats")
+
+callbacks = 0
+python_time = 0.0
+clock = None
+
+tests = []
+
+register_functions = {
+    'register_timed_callback': 1,
+    'register_value_change_callback': 1,
+    'register_readonly_callback': 0,
+    'register_nextstep_callback': 0,
+    'register_rwsynch_callback': 0,
+}
+
+
+def counted(func):
+    def callback(*args, **kwargs):
+        global callbacks, python_time
+        callbacks += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            python_time += time.perf_counter() - start
+    return callback
+
+
+def wrap_register(register, index):
+    def wrapper(*args, **kwargs):
+        args = list(args)
+        args[index] = counted(args[index])
+        return register(*args, **kwargs)
+    return wrapper
+
+
+def wrap_clock_init(init):
+    def wrapper(self, *args, **kwargs):
+        global clock
+        init(self, *args, **kwargs)
+        if clock is None:
+            clock = self
+    return wrapper
+
+
+def snapshot():
+    return {
+        'sim_time': get_sim_time(),
+        'sim_time_ns': get_sim_time('ns'),
+        'wall_time': time.perf_counter(),
+        'callbacks': callbacks,
+        'python_time': python_time,
+    }
+
+
+start = None
+
+
+def begin_test():
+    global start, clock
+    start = snapshot()
+    clock = None
+
+
+def end_test(name):
+    end = snapshot()
+
+    wall = end['wall_time'] - start['wall_time']
+    sim_ns = end['sim_time_ns'] - start['sim_time_ns']
+    py = end['python_time'] - start['python_time']
+
+    period = getattr(clock, 'period', None)
+    cycles = (end['sim_time'] - start['sim_time']) // period if isinstance(period, int) and period else None
+
+    tests.append({
+        'test': name,
+        'sim_time_ns': sim_ns,
+        'wall_time_s': wall,
+        'python_time_s': py,
+        'simulator_time_s': max(wall - py, 0.0),
+        'clock': getattr(getattr(clock, 'signal', None), '_name', None),
+        'clock_cycles_est': cycles,
+        'cycles_per_s': cycles / wall if cycles is not None and wall > 0 else None,
+        'sim_ns_per_s': sim_ns / wall if wall > 0 else None,
+        'gpi_callbacks': end['callbacks'] - start['callbacks'],
+    })
+
+    with open(stats_file, 'w') as f:
+        json.dump(tests, f, indent=2)
+
+
+def install():
+    if simulator is not None:
+        for name, index in register_functions.items():
+            if hasattr(simulator, name):
+                setattr(simulator, name, wrap_register(getattr(simulator, name), index))
+
+    Clock.__init__ = wrap_clock_init(Clock.__init__)
+
+    if not hook_tests(begin_test, lambda name: start is not None and end_test(name)):
+        log.warning("sim_stats: cannot hook cocotb %s test runner, no statistics recorded",
+            getattr(cocotb, '__version__', '?'))
+
+
+def hook_tests(begin, end):
+    """
+    Call begin() before each cocotb test starts and end(name) when its
+    result is recorded, from the regression manager; returns False if
+    this cocotb version lacks the methods to hook
+    """
+    rm = cocotb.regression.RegressionManager
+
+    if not hasattr(rm, '_record_result') or not hasattr(rm, '_init_test'):
+        return False
+
+    init_test = rm._init_test
+    record_result = rm._record_result
+
+    def _init_test(self, *args, **kwargs):
+        begin()
+        return init_test(self, *args, **kwargs)
+
+    def _record_result(self, test, *args, **kwargs):
+        end(getattr(test, '__qualname__', None) or getattr(test, 'name', repr(test)))
+        return record_result(self, test, *args, **kwargs)
+
+    rm._init_test = _init_test
+    rm._record_result = _record_result
+
+    return True
+
+
+if stats_file:
+    install()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+
+Copyright (c) 2018 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+from myhdl import *
+
+import axis_ep
+import eth_ep
+
+def bench(idle_sleep, timing, trace):
+
+    # Inputs
+    clk = Signal(bool(0))
+    rst = Signal(bool(0))
+    tick = Signal(bool(0))
+
+    axis_tdata = Signal(intbv(0)[8:])
+    axis_tvalid = Signal(bool(0))
+    axis_tready = Signal(bool(1))
+    axis_tlast = Signal(bool(0))
+
+    eth_hdr_valid = Signal(bool(0))
+    eth_hdr_ready = Signal(bool(1))
+    eth_type = Signal(intbv(0)[16:])
+    eth_payload_tdata = Signal(intbv(0)[8:])
+    eth_payload_tvalid = Signal(bool(0))
+    eth_payload_tready = Signal(bool(1))
+    eth_payload_tlast = Signal(bool(0))
+
+    # sources
+    axis_source = axis_ep.AXIStreamSource(idle_sleep=idle_sleep)
+
+    axis_source_logic = axis_source.create_logic(
+        clk,
+        rst,
+        tdata=axis_tdata,
+        tvalid=axis_tvalid,
+        tready=axis_tready,
+        tlast=axis_tlast
+    )
+
+    eth_source = eth_ep.EthFrameSource(idle_sleep=idle_sleep)
+
+    eth_source_logic = eth_source.create_logic(
+        clk,
+        rst,
+        eth_hdr_valid=eth_hdr_valid,
+        eth_hdr_ready=eth_hdr_ready,
+        eth_type=eth_type,
+        eth_payload_tdata=eth_payload_tdata,
+        eth_payload_tvalid=eth_payload_tvalid,
+        eth_payload_tready=eth_payload_tready,
+        eth_payload_tlast=eth_payload_tlast
+    )
+
+    @always(delay(4))
+    def clkgen():
+        clk.next = not clk
+        # tick rises with clk, but its waiters resume ahead of the sources,
+        # as a polling source only sees a frame sent on the same edge when
+        # the sender runs first
+        tick.next = not clk
+
+    @instance
+    def monitor():
+        while True:
+            yield clk.posedge
+            trace.append((now(), int(axis_tvalid), int(axis_tdata), int(axis_tlast),
+                int(eth_hdr_valid), int(eth_type), int(eth_payload_tvalid),
+                int(eth_payload_tdata), int(eth_payload_tlast)))
+
+    @instance
+    def check():
+        yield tick.posedge
+        rst.next = 1
+        yield tick.posedge
+        rst.next = 0
+
+        for i in range(8):
+            for k in range(i+2):
+                yield tick.posedge
+
+            if timing == 'negedge':
+                yield clk.negedge
+            elif timing == 'delay':
+                yield delay(2)
+
+            axis_source.send(bytearray(range(i, i+3)))
+            eth_source.send(eth_ep.EthFrame(payload=bytearray(range(i+1)), eth_type=0x8000+i))
+            if i % 2:
+                axis_source.send(bytearray([0xaa]))
+                eth_source.send(eth_ep.EthFrame(payload=bytearray([0x55]), eth_type=0x9000+i))
+
+        for k in range(20):
+            yield tick.posedge
+
+        raise StopSimulation
+
+    return instances()
+
+def test_bench():
+    for timing in ['posedge', 'negedge', 'delay']:
+        print("test: idle_sleep trace, frames sent on %s" % timing)
+
+        traces = []
+        for idle_sleep in [False, True]:
+            trace = []
+            sim = Simulation(bench(idle_sleep, timing, trace))
+            sim.run(quiet=1)
+            traces.append(trace)
+
+        assert traces[0] == traces[1]
+
+if __name__ == '__main__':
+    print("Running test...")
+    test_bench()
@@ -25,10 +25,12 @@ THE SOFTWARE.
 
 from myhdl import *
 import os
+import vvp_build
 
 import eth_ep
 import arp_ep
 import ip_ep
+import latency_ep
 
 module = 'ip_complete_64'
 testbench = 'test_%s' % module
@@ -49,10 +51,6 @@ srcs.append("../lib/axis/rtl/arbiter.v")
 srcs.append("../lib/axis/rtl/priority_encoder.v")
 srcs.append("%s.v" % testbench)
 
-src = ' '.join(srcs)
-
-build_cmd = "iverilog -o %s.vvp %s" % (testbench, src)
-
 def bench():
 
     # Inputs
@@ -241,7 +239,7 @@ def bench():
     )
 
     # DUT
-    if os.system(build_cmd):
+    if vvp_build.build(testbench, srcs):
         raise Exception("Error running build command")
 
     dut = Cosimulation(
@@ -331,6 +329,50 @@ def bench():
         clear_arp_cache=clear_arp_cache
     )
 
+    # latency monitors, enabled during the latency sweep
+    latency_enable = Signal(bool(0))
+    latency_stats = latency_ep.LatencyStats()
+
+    ip_tx_latency = latency_ep.LatencyMonitor(latency_stats, 'ip_complete_64 tx', 8)
+
+    ip_tx_latency_logic = ip_tx_latency.create_logic(
+        clk,
+        rst,
+        in_tvalid=s_ip_payload_axis_tvalid,
+        in_tready=s_ip_payload_axis_tready,
+        in_tlast=s_ip_payload_axis_tlast,
+        out_tvalid=m_eth_payload_axis_tvalid,
+        out_tready=m_eth_payload_axis_tready,
+        out_tlast=m_eth_payload_axis_tlast,
+        in_tkeep=s_ip_payload_axis_tkeep,
+        out_tkeep=m_eth_payload_axis_tkeep,
+        in_hdr_valid=s_ip_hdr_valid,
+        out_hdr_valid=m_eth_hdr_valid,
+        out_hdr_ready=m_eth_hdr_ready,
+        size_from='in',
+        enable=latency_enable
+    )
+
+    ip_rx_latency = latency_ep.LatencyMonitor(latency_stats, 'ip_complete_64 rx', 8)
+
+    ip_rx_latency_logic = ip_rx_latency.create_logic(
+        clk,
+        rst,
+        in_tvalid=s_eth_payload_axis_tvalid,
+        in_tready=s_eth_payload_axis_tready,
+        in_tlast=s_eth_payload_axis_tlast,
+        out_tvalid=m_ip_payload_axis_tvalid,
+        out_tready=m_ip_payload_axis_tready,
+        out_tlast=m_ip_payload_axis_tlast,
+        in_tkeep=s_eth_payload_axis_tkeep,
+        out_tkeep=m_ip_payload_axis_tkeep,
+        in_hdr_valid=s_eth_hdr_valid,
+        out_hdr_valid=m_ip_hdr_valid,
+        out_hdr_ready=m_ip_hdr_ready,
+        size_from='out',
+        enable=latency_enable
+    )
+
     @always(delay(4))
     def clkgen():
         clk.next = not clk
@@ -566,6 +608,87 @@ def bench():
 
         yield delay(100)
 
+        if os.getenv('LATENCY'):
+            yield clk.posedge
+            print("test 4: IP latency")
+            current_test.next = 4
+
+            latency_enable.next = 1
+
+            for size in latency_ep.payload_sizes:
+                for k in range(latency_ep.frame_count):
+                    test_frame = ip_ep.IPFrame()
+                    test_frame.eth_dest_mac = 0xDAD1D2D3D4D5
+                    test_frame.eth_src_mac = 0x5A5152535455
+                    test_frame.eth_type = 0x0800
+                    test_frame.ip_version = 4
+                    test_frame.ip_ihl = 5
+                    test_frame.ip_dscp = 0
+                    test_frame.ip_ecn = 0
+                    test_frame.ip_length = None
+                    test_frame.ip_identification = 0
+                    test_frame.ip_flags = 2
+                    test_frame.ip_fragment_offset = 0
+                    test_frame.ip_ttl = 64
+                    test_frame.ip_protocol = 0x11
+                    test_frame.ip_header_checksum = None
+                    test_frame.ip_source_ip = 0xc0a80164
+                    test_frame.ip_dest_ip = 0xc0a80166
+                    test_frame.payload = bytearray([x % 256 for x in range(size)])
+                    test_frame.build()
+
+                    ip_source.send(test_frame)
+
+                    yield eth_sink.wait()
+                    rx_frame = eth_sink.recv()
+
+                    check_frame = ip_ep.IPFrame()
+                    check_frame.parse_eth(rx_frame)
+
+                    assert check_frame == test_frame
+
+                    test_frame = ip_ep.IPFrame()
+                    test_frame.eth_dest_mac = 0x5A5152535455
+                    test_frame.eth_src_mac = 0xDAD1D2D3D4D5
+                    test_frame.eth_type = 0x0800
+                    test_frame.ip_version = 4
+                    test_frame.ip_ihl = 5
+                    test_frame.ip_dscp = 0
+                    test_frame.ip_ecn = 0
+                    test_frame.ip_length = None
+                    test_frame.ip_identification = 0
+                    test_frame.ip_flags = 2
+                    test_frame.ip_fragment_offset = 0
+                    test_frame.ip_ttl = 64
+                    test_frame.ip_protocol = 0x11
+                    test_frame.ip_header_checksum = None
+                    test_frame.ip_source_ip = 0xc0a80165
+                    test_frame.ip_dest_ip = 0xc0a80164
+                    test_frame.payload = bytearray([x % 256 for x in range(size)])
+                    test_frame.build()
+
+                    eth_source.send(test_frame.build_eth())
+
+                    yield ip_sink.wait()
+                    rx_frame = ip_sink.recv()
+
+                    assert rx_frame == test_frame
+
+            yield clk.posedge
+            latency_enable.next = 0
+
+            for line in latency_stats.format_summary():
+                print(line)
+
+            latency_stats.write()
+
+            assert eth_source.empty()
+            assert eth_sink.empty()
+            assert ip_source.empty()
+            assert ip_sink.empty()
+
+            yield delay(100)
+
         raise StopSimulation
 
     return instances()
@@ -25,6 +25,7 @@ THE SOFTWARE.
 
 from myhdl import *
 import os
+import vvp_build
 
 import eth_ep
 import arp_ep
@@ -57,10 +58,6 @@ srcs.append("../lib/axis/rtl/priority_encoder.v")
 srcs.append("../lib/axis/rtl/axis_fifo.v")
 srcs.append("%s.v" % testbench)
 
-src = ' '.join(srcs)
-
-build_cmd = "iverilog -o %s.vvp %s" % (testbench, src)
-
 def bench():
 
     # Parameters
@@ -206,7 +203,7 @@ def bench():
     udp_source_pause = Signal(bool(0))
     udp_sink_pause = Signal(bool(0))
 
-    eth_source = eth_ep.EthFrameSource()
+    eth_source = eth_ep.EthFrameSource(idle_sleep=True)
 
     eth_source_logic = eth_source.create_logic(
         clk,
@@ -244,7 +241,7 @@ def bench():
         name='eth_sink'
     )
 
-    ip_source = ip_ep.IPFrameSource()
+    ip_source = ip_ep.IPFrameSource(idle_sleep=True)
 
     ip_source_logic = ip_source.create_logic(
         clk,
@@ -299,7 +296,7 @@ def bench():
         name='ip_sink'
     )
 
-    udp_source = udp_ep.UDPFrameSource()
+    udp_source = udp_ep.UDPFrameSource(idle_sleep=True)
 
     udp_source_logic = udp_source.create_logic(
         clk,
@@ -361,7 +358,7 @@ def bench():
     )
 
     # DUT
-    if os.system(build_cmd):
+    if vvp_build.build(testbench, srcs):
         raise Exception("Error running build command")
 
     dut = Cosimulation(
@@ -25,11 +25,13 @@ THE SOFTWARE.
 
 from myhdl import *
 import os
+import vvp_build
 
 import eth_ep
 import arp_ep
 import ip_ep
 import udp_ep
+import latency_ep
 
 module = 'udp_complete_64'
 testbench = 'test_%s' % module
@@ -57,10 +59,6 @@ srcs.append("../lib/axis/rtl/priority_encoder.v")
 srcs.append("../lib/axis/rtl/axis_fifo.v")
 srcs.append("%s.v" % testbench)
 
-src = ' '.join(srcs)
-
-build_cmd = "iverilog -o %s.vvp %s" % (testbench, src)
-
 def bench():
 
     # Parameters
@@ -212,7 +210,7 @@ def bench():
     udp_source_pause = Signal(bool(0))
     udp_sink_pause = Signal(bool(0))
 
-    eth_source = eth_ep.EthFrameSource()
+    eth_source = eth_ep.EthFrameSource(idle_sleep=True)
 
     eth_source_logic = eth_source.create_logic(
         clk,
@@ -252,7 +250,7 @@ def bench():
         name='eth_sink'
     )
 
-    ip_source = ip_ep.IPFrameSource()
+    ip_source = ip_ep.IPFrameSource(idle_sleep=True)
 
     ip_source_logic = ip_source.create_logic(
         clk,
@@ -309,7 +307,7 @@ def bench():
         name='ip_sink'
     )
 
-    udp_source = udp_ep.UDPFrameSource()
+    udp_source = udp_ep.UDPFrameSource(idle_sleep=True)
 
     udp_source_logic = udp_source.create_logic(
         clk,
@@ -373,7 +371,7 @@ def bench():
     )
 
     # DUT
-    if os.system(build_cmd):
+    if vvp_build.build(testbench, srcs):
         raise Exception("Error running build command")
 
     dut = Cosimulation(
@@ -515,6 +513,50 @@ def bench():
         clear_arp_cache=clear_arp_cache
     )
 
+    # latency monitors, enabled during the latency sweep
+    latency_enable = Signal(bool(0))
+    latency_stats = latency_ep.LatencyStats()
+
+    udp_tx_latency = latency_ep.LatencyMonitor(latency_stats, 'udp_complete_64 tx', 8)
+
+    udp_tx_latency_logic = udp_tx_latency.create_logic(
+        clk,
+        rst,
+        in_tvalid=s_udp_payload_axis_tvalid,
+        in_tready=s_udp_payload_axis_tready,
+        in_tlast=s_udp_payload_axis_tlast,
+        out_tvalid=m_eth_payload_axis_tvalid,
+        out_tready=m_eth_payload_axis_tready,
+        out_tlast=m_eth_payload_axis_tlast,
+        in_tkeep=s_udp_payload_axis_tkeep,
+        out_tkeep=m_eth_payload_axis_tkeep,
+        in_hdr_valid=s_udp_hdr_valid,
+        out_hdr_valid=m_eth_hdr_valid,
+        out_hdr_ready=m_eth_hdr_ready,
+        size_from='in',
+        enable=latency_enable
+    )
+
+    udp_rx_latency = latency_ep.LatencyMonitor(latency_stats, 'udp_complete_64 rx', 8)
+
+    udp_rx_latency_logic = udp_rx_latency.create_logic(
+        clk,
+        rst,
+        in_tvalid=s_eth_payload_axis_tvalid,
+        in_tready=s_eth_payload_axis_tready,
+        in_tlast=s_eth_payload_axis_tlast,
+        out_tvalid=m_udp_payload_axis_tvalid,
+        out_tready=m_udp_payload_axis_tready,
+        out_tlast=m_udp_payload_axis_tlast,
+        in_tkeep=s_eth_payload_axis_tkeep,
+        out_tkeep=m_udp_payload_axis_tkeep,
+        in_hdr_valid=s_eth_hdr_valid,
+        out_hdr_valid=m_udp_hdr_valid,
+        out_hdr_ready=m_udp_hdr_ready,
+        size_from='out',
+        enable=latency_enable
+    )
+
     @always(delay(4))
     def clkgen():
         clk.next = not clk
@@ -847,6 +889,91 @@ def bench():
 
         yield delay(100)
 
+        if os.getenv('LATENCY'):
+            yield clk.posedge
+            print("test 6: UDP latency")
+            current_test.next = 6
+
+            latency_enable.next = 1
+
+            for size in latency_ep.payload_sizes:
+                for k in range(latency_ep.frame_count):
+                    test_frame = udp_ep.UDPFrame()
+                    test_frame.eth_dest_mac = 0xDAD1D2D3D4D5
+                    test_frame.eth_src_mac = 0x5A5152535455
+                    test_frame.eth_type = 0x0800
+                    test_frame.ip_version = 4
+                    test_frame.ip_ihl = 5
+                    test_frame.ip_dscp = 0
+                    test_frame.ip_ecn = 0
+                    test_frame.ip_length = None
+                    test_frame.ip_identification = 0
+                    test_frame.ip_flags = 2
+                    test_frame.ip_fragment_offset = 0
+                    test_frame.ip_ttl = 64
+                    test_frame.ip_protocol = 0x11
+                    test_frame.ip_header_checksum = None
+                    test_frame.ip_source_ip = 0xc0a80164
+                    test_frame.ip_dest_ip = 0xc0a80166
+                    test_frame.udp_source_port = 1234
+                    test_frame.udp_dest_port = 5678
+                    test_frame.payload = bytearray([x % 256 for x in range(size)])
+                    test_frame.build()
+
+                    udp_source.send(test_frame)
+
+                    yield eth_sink.wait()
+                    rx_frame = eth_sink.recv()
+
+                    check_frame = udp_ep.UDPFrame()
+                    check_frame.parse_eth(rx_frame)
+
+                    assert check_frame == test_frame
+
+                    test_frame = udp_ep.UDPFrame()
+                    test_frame.eth_dest_mac = 0x5A5152535455
+                    test_frame.eth_src_mac = 0xDAD1D2D3D4D5
+                    test_frame.eth_type = 0x0800
+                    test_frame.ip_version = 4
+                    test_frame.ip_ihl = 5
+                    test_frame.ip_dscp = 0
+                    test_frame.ip_ecn = 0
+                    test_frame.ip_length = None
+                    test_frame.ip_identification = 0
+                    test_frame.ip_flags = 2
+                    test_frame.ip_fragment_offset = 0
+                    test_frame.ip_ttl = 64
+                    test_frame.ip_protocol = 0x11
+                    test_frame.ip_header_checksum = None
+                    test_frame.ip_source_ip = 0xc0a80165
+                    test_frame.ip_dest_ip = 0xc0a80164
+                    test_frame.udp_source_port = 1234
+                    test_frame.udp_dest_port = 5678
+                    test_frame.payload = bytearray([x % 256 for x in range(size)])
+                    test_frame.build()
+
+                    eth_source.send(test_frame.build_eth())
+
+                    yield udp_sink.wait()
+                    rx_frame = udp_sink.recv()
+
+                    assert rx_frame == test_frame
+
+            yield clk.posedge
+            latency_enable.next = 0
+
+            for line in latency_stats.format_summary():
+                print(line)
+
+            latency_stats.write()
+
+            assert eth_source.empty()
+            assert eth_sink.empty()
+            assert udp_source.empty()
+            assert udp_sink.empty()
+
+            yield delay(100)
+
         raise StopSimulation
 
     return instances()
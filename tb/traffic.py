@@ -0,0 +1,388 @@
+"""
+
+Copyright (c) 2020 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+# Randomized traffic profiles
+#
+# A TrafficProfile combines a frame size distribution (IMIX, uniform,
+# bimodal, or derived from a trace) with an arrival process (back to back,
+# Poisson, or on/off bursts) and a seeded random generator, so a failing
+# run can be reproduced from the logged seed.  Frame sizes are Ethernet
+# frame lengths including FCS; idle gaps are in byte times at line rate,
+# on top of the interframe gap the MAC or source model inserts.
+#
+# TRAFFIC_SIZES, TRAFFIC_ARRIVAL and TRAFFIC_SEED override the profile
+# from the environment, see TrafficProfile.from_env.
+#
+# FifoOccupancy samples the fill level of an axis_async_fifo instance
+# while traffic runs, to see how much of the FIFO a traffic mix uses.
+
+import math
+import os
+import random
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge, Timer
+    from cocotb.utils import get_sim_time
+except ImportError:
+    cocotb = None
+
+PREAMBLE_LEN = 8
+FCS_LEN = 4
+IFG_LEN = 12
+
+DEFAULT_SEED = 1
+
+
+class SizeDistribution(object):
+    """
+    Weighted discrete frame size distribution
+    """
+
+    def __init__(self, sizes, weights=None, name=None):
+        sizes = list(sizes)
+        weights = list(weights) if weights is not None else [1]*len(sizes)
+
+        assert sizes and len(sizes) == len(weights)
+
+        self.sizes = sizes
+        self.weights = weights
+        self.name = name or "sizes"
+
+        total = float(sum(weights))
+        self.cum_weights = []
+        acc = 0
+        for w in weights:
+            acc += w
+            self.cum_weights.append(acc)
+        self.mean = sum(s*w for s, w in zip(sizes, weights)) / total
+
+    def sample(self, rng):
+        return rng.choices(self.sizes, cum_weights=self.cum_weights)[0]
+
+    def __repr__(self):
+        return self.name
+
+
+class UniformSizes(object):
+    """
+    Frame sizes uniformly distributed over [min_size, max_size]
+    """
+
+    def __init__(self, min_size=64, max_size=1518):
+        assert min_size <= max_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.mean = (min_size + max_size) / 2.0
+
+    def sample(self, rng):
+        return rng.randint(self.min_size, self.max_size)
+
+    def __repr__(self):
+        return "uniform(%d, %d)" % (self.min_size, self.max_size)
+
+
+def imix():
+    """
+    Simple IMIX, 64:576:1518 byte frames in 7:4:1 proportion
+    """
+    return SizeDistribution([64, 576, 1518], [7, 4, 1], name="imix")
+
+
+def uniform(min_size=64, max_size=1518):
+    return UniformSizes(min_size, max_size)
+
+
+def bimodal(small=64, large=1518, p_small=0.5):
+    return SizeDistribution([small, large], [p_small, 1-p_small],
+        name="bimodal(%d, %d, %g)" % (small, large, p_small))
+
+
+def from_trace(trace, fcs=True):
+    """
+    Empirical size distribution from a trace
+
+    trace is a list of frame sizes, a text file with one size or one
+    "size count" pair per line, or a pcap/pcapng file (requires scapy).
+    Captured packets do not include the FCS, so it is added unless fcs is
+    false.
+    """
+    name = "trace"
+    hist = {}
+
+    if isinstance(trace, str):
+        name = "trace(%s)" % os.path.basename(trace)
+
+        if os.path.splitext(trace)[1] in ('.pcap', '.pcapng', '.cap'):
+            from scapy.utils import PcapReader
+
+            with PcapReader(trace) as reader:
+                for pkt in reader:
+                    size = len(pkt) + (FCS_LEN if fcs else 0)
+                    hist[size] = hist.get(size, 0) + 1
+        else:
+            with open(trace) as f:
+                for line in f:
+                    line = line.split('#')[0].split()
+                    if not line:
+                        continue
+                    size = int(line[0])
+                    hist[size] = hist.get(size, 0) + (int(line[1]) if len(line) > 1 else 1)
+    else:
+        for size in trace:
+            hist[size] = hist.get(size, 0) + 1
+
+    if not hist:
+        raise ValueError("empty trace")
+
+    sizes = sorted(hist)
+    return SizeDistribution(sizes, [hist[s] for s in sizes], name=name)
+
+
+def wire_bytes(size):
+    return PREAMBLE_LEN + size + IFG_LEN
+
+
+class BackToBack(object):
+    """
+    No idle time between frames
+    """
+
+    load = 1.0
+
+    def gap(self, rng, size):
+        return 0
+
+    def __repr__(self):
+        return "b2b"
+
+
+class Poisson(object):
+    """
+    Poisson arrivals at an average offered load (fraction of line rate)
+
+    The idle time after each frame is exponentially distributed, scaled
+    so that the mean utilization matches load.
+    """
+
+    def __init__(self, load=0.5):
+        assert 0 < load <= 1
+        self.load = load
+
+    def gap(self, rng, size):
+        if self.load >= 1:
+            return 0
+        mean = wire_bytes(size) * (1 - self.load) / self.load
+        return int(round(rng.expovariate(1.0 / mean)))
+
+    def __repr__(self):
+        return "poisson(%g)" % self.load
+
+
+class OnOff(object):
+    """
+    On/off bursts at an average offered load
+
+    Bursts of back to back frames with geometrically distributed length
+    (mean burst frames) are separated by exponentially distributed off
+    periods, scaled so that the mean utilization matches load.
+    """
+
+    def __init__(self, load=0.5, burst=16):
+        assert 0 < load <= 1
+        assert burst >= 1
+        self.load = load
+        self.burst = burst
+
+    def gap(self, rng, size):
+        if self.load >= 1 or rng.random() >= 1.0 / self.burst:
+            return 0
+        # end of burst: off time for the burst that just ended
+        mean = self.burst * wire_bytes(size) * (1 - self.load) / self.load
+        return int(round(rng.expovariate(1.0 / mean)))
+
+    def __repr__(self):
+        return "onoff(%g, %d)" % (self.load, self.burst)
+
+
+def parse_sizes(spec):
+    """
+    imix, uniform[:min:max], bimodal[:small:large:p_small] or trace:file
+    """
+    name, _, args = spec.partition(':')
+
+    if name == 'imix':
+        return imix()
+    if name == 'uniform':
+        return uniform(*[int(x) for x in args.split(':') if x])
+    if name == 'bimodal':
+        args = [x for x in args.split(':') if x]
+        return bimodal(*[float(x) if k == 2 else int(x) for k, x in enumerate(args)])
+    if name == 'trace':
+        return from_trace(args)
+
+    raise ValueError("unknown size distribution: %s" % spec)
+
+
+def parse_arrivals(spec):
+    """
+    b2b, poisson[:load] or onoff[:load[:burst]]
+    """
+    name, _, args = spec.partition(':')
+    args = [x for x in args.split(':') if x]
+
+    if name == 'b2b':
+        return BackToBack()
+    if name == 'poisson':
+        return Poisson(*[float(x) for x in args])
+    if name == 'onoff':
+        return OnOff(*[float(x) if k == 0 else int(x) for k, x in enumerate(args)])
+
+    raise ValueError("unknown arrival process: %s" % spec)
+
+
+class TrafficProfile(object):
+    """
+    Seeded frame size and arrival pattern generator
+    """
+
+    def __init__(self, sizes=None, arrivals=None, seed=None):
+        self.sizes = sizes or imix()
+        self.arrivals = arrivals or BackToBack()
+
+        if seed is None:
+            seed = DEFAULT_SEED
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def from_env(cls, sizes=None, arrivals=None, seed=None):
+        """
+        Profile with TRAFFIC_SIZES, TRAFFIC_ARRIVAL and TRAFFIC_SEED taking
+        precedence over the arguments; TRAFFIC_SEED=random picks a new
+        seed, which is logged with the profile
+        """
+        if os.getenv("TRAFFIC_SIZES"):
+            sizes = parse_sizes(os.getenv("TRAFFIC_SIZES"))
+        if os.getenv("TRAFFIC_ARRIVAL"):
+            arrivals = parse_arrivals(os.getenv("TRAFFIC_ARRIVAL"))
+
+        env_seed = os.getenv("TRAFFIC_SEED")
+        if env_seed == 'random':
+            seed = random.SystemRandom().randrange(2**32)
+        elif env_seed:
+            seed = int(env_seed, 0)
+
+        return cls(sizes, arrivals, seed)
+
+    def offered_load(self):
+        return self.arrivals.load
+
+    def frames(self, count, overhead=FCS_LEN, min_size=None):
+        """
+        List of (payload, gap) pairs, with payload lengths size-overhead
+        and gap the idle byte times to wait before sending the frame
+        """
+        frames = []
+        gap = 0
+
+        for k in range(count):
+            size = self.sizes.sample(self.rng)
+            if min_size is not None:
+                size = max(size, min_size)
+            n = max(size-overhead, 0)
+            payload = self.rng.getrandbits(8*n).to_bytes(n, 'little') if n else b''
+            frames.append((payload, gap))
+            gap = self.arrivals.gap(self.rng, size)
+
+        return frames
+
+    def __repr__(self):
+        return "TrafficProfile(%r, %r, seed=%d)" % (self.sizes, self.arrivals, self.seed)
+
+
+class FifoOccupancy(object):
+    """
+    Fill level of an axis_async_fifo instance in FIFO words
+
+    Samples the write and read pointers on every rising edge of clock.
+    The write pointer includes a frame that is still being written in
+    frame FIFO mode.
+    """
+
+    def __init__(self, fifo, clock):
+        self.wr_ptr = fifo.wr_ptr_cur_reg
+        self.rd_ptr = fifo.rd_ptr_reg
+        self.clock = clock
+
+        self.mask = (1 << len(self.wr_ptr)) - 1
+        self.depth = 1 << (len(self.wr_ptr) - 1)
+
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+
+        self._task = cocotb.fork(self._run())
+
+    def stop(self):
+        self._task.kill()
+
+    def mean(self):
+        return self.total / float(self.samples) if self.samples else 0.0
+
+    def __repr__(self):
+        return "max %d, mean %.1f of %d words" % (self.max, self.mean(), self.depth)
+
+    async def _run(self):
+        while True:
+            await RisingEdge(self.clock)
+
+            try:
+                level = (self.wr_ptr.value.integer - self.rd_ptr.value.integer) & self.mask
+            except ValueError:
+                continue
+
+            self.samples += 1
+            self.total += level
+            self.max = max(self.max, level)
+
+
+async def drive(source, frames, byte_time_ns, wrap=None):
+    """
+    Send (payload, gap) pairs through source, waiting for the source to go
+    idle and then gap byte times before each frame with a nonzero gap;
+    wrap converts a payload into the source's frame type.  Returns the
+    elapsed sim time in ns.
+    """
+    start = get_sim_time('ns')
+
+    for payload, gap in frames:
+        if gap:
+            await source.wait()
+            await Timer(int(math.ceil(gap*byte_time_ns*1000)), 'ps')
+        await source.send(wrap(payload) if wrap else payload)
+
+    await source.wait()
+
+    return get_sim_time('ns') - start
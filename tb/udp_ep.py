@@ -24,11 +24,27 @@ THE SOFTWARE.
 
 from myhdl import *
 import axis_ep
+from collections import deque
 import eth_ep
 import ip_ep
+from inet_checksum import checksum_sum, checksum_fold
 import struct
 
+udp_hdr = struct.Struct('>HHHH')
+
+UDP_HDR_LEN = udp_hdr.size
+
+def pack_udp_header(buf, offset, frame):
+    udp_hdr.pack_into(buf, offset,
+        frame.udp_source_port,
+        frame.udp_dest_port,
+        frame.udp_length,
+        frame.udp_checksum
+    )
+
 class UDPFrame(object):
+    __slots__ = ('_payload', 'eth_dest_mac', 'eth_src_mac', 'eth_type', 'ip_version', 'ip_ihl', 'ip_dscp', 'ip_ecn', 'ip_length', 'ip_identification', 'ip_flags', 'ip_fragment_offset', 'ip_ttl', 'ip_protocol', 'ip_header_checksum', 'ip_source_ip', 'ip_dest_ip', 'udp_source_port', 'udp_dest_port', 'udp_length', 'udp_checksum', '_payload_sum')
+
     def __init__(self,
                 payload=b'',
                 eth_dest_mac=0,
@@ -53,7 +69,6 @@ class UDPFrame(object):
                 udp_checksum=None
             ):
 
-        self._payload = axis_ep.AXIStreamFrame()
         self.eth_dest_mac = eth_dest_mac
         self.eth_src_mac = eth_src_mac
         self.eth_type = eth_type
@@ -74,9 +89,10 @@ class UDPFrame(object):
         self.udp_dest_port = udp_dest_port
         self.udp_length = udp_length
         self.udp_checksum = udp_checksum
+        self._payload_sum = None
 
         if type(payload) is dict:
-            self.payload = axis_ep.AXIStreamFrame(payload['udp_payload'])
+            self._payload = axis_ep.AXIStreamFrame(payload['udp_payload'])
             self.eth_dest_mac = payload['eth_dest_mac']
             self.eth_src_mac = payload['eth_src_mac']
             self.eth_type = payload['eth_type']
@@ -97,12 +113,11 @@ class UDPFrame(object):
             self.udp_dest_port = payload['udp_dest_port']
             self.udp_length = payload['udp_length']
             self.udp_checksum = payload['udp_checksum']
-        if type(payload) is bytes:
-            payload = bytearray(payload)
-        if type(payload) is bytearray or type(payload) is axis_ep.AXIStreamFrame:
-            self.payload = axis_ep.AXIStreamFrame(payload)
-        if type(payload) is UDPFrame:
-            self.payload = axis_ep.AXIStreamFrame(payload.payload)
+        elif type(payload) in (bytes, bytearray, axis_ep.AXIStreamFrame):
+            self._payload = axis_ep.AXIStreamFrame(payload)
+        elif type(payload) is UDPFrame:
+            self._payload = axis_ep.AXIStreamFrame(payload._payload)
+            self._payload_sum = payload._payload_sum
             self.eth_dest_mac = payload.eth_dest_mac
             self.eth_src_mac = payload.eth_src_mac
             self.eth_type = payload.eth_type
@@ -123,6 +138,8 @@ class UDPFrame(object):
             self.udp_dest_port = payload.udp_dest_port
             self.udp_length = payload.udp_length
             self.udp_checksum = payload.udp_checksum
+        else:
+            self._payload = axis_ep.AXIStreamFrame()
 
     @property
     def payload(self):
@@ -136,7 +153,7 @@ class UDPFrame(object):
         self.ip_length = self.udp_length + 20
 
     def update_udp_length(self):
-        self.udp_length = len(self.payload.data) + 8
+        self.udp_length = self.payload.length() + 8
 
     def update_length(self):
         self.update_udp_length()
@@ -152,9 +169,7 @@ class UDPFrame(object):
         cksum += (self.ip_source_ip >> 16) & 0xffff
         cksum += self.ip_dest_ip & 0xffff
         cksum += (self.ip_dest_ip >> 16) & 0xffff
-        cksum = (cksum & 0xffff) + (cksum >> 16)
-        cksum = (cksum & 0xffff) + (cksum >> 16)
-        return ~cksum & 0xffff
+        return ~checksum_fold(cksum) & 0xffff
 
     def update_ip_checksum(self):
         self.ip_header_checksum = self.calc_ip_checksum()
@@ -183,16 +198,18 @@ class UDPFrame(object):
         cksum += self.udp_source_port
         cksum += self.udp_dest_port
         cksum += self.udp_length
-        odd = False
-        for d in self.payload.data:
-            if odd:
-                cksum += d
-            else:
-                cksum += d << 8
-            odd = not odd
-        cksum = (cksum & 0xffff) + (cksum >> 16)
-        cksum = (cksum & 0xffff) + (cksum >> 16)
-        return ~cksum & 0xffff
+        cksum += self.calc_udp_payload_sum()
+        return ~checksum_fold(cksum) & 0xffff
+
+    def calc_udp_payload_sum(self):
+        # the payload sum is cached for as long as the payload buffer is
+        # private, so sweeping header fields does not re-sum the payload
+        buf = self.payload.stable_buffer()
+        if buf is None:
+            return checksum_sum(self.payload.data)
+        if self._payload_sum is None or self._payload_sum[0] is not buf:
+            self._payload_sum = (buf, checksum_sum(buf))
+        return self._payload_sum[1]
 
     def update_udp_checksum(self):
         if self.udp_length is None:
@@ -219,25 +236,34 @@ class UDPFrame(object):
         if self.ip_header_checksum is None:
             self.update_ip_checksum()
 
+    def build_bytes(self, offset=eth_ep.ETH_HDR_LEN+ip_ep.IP_HDR_LEN):
+        # headers and payload written straight into a single buffer; offset
+        # selects how many of the Ethernet, IP and UDP headers are included
+        self.build()
+        n = offset + UDP_HDR_LEN
+        buf = bytearray(n + self.payload.length())
+
+        if offset >= eth_ep.ETH_HDR_LEN + ip_ep.IP_HDR_LEN:
+            eth_ep.pack_eth_header(buf, 0, self)
+        if offset >= ip_ep.IP_HDR_LEN:
+            ip_ep.pack_ip_header(buf, offset-ip_ep.IP_HDR_LEN, self)
+        pack_udp_header(buf, offset, self)
+        self.payload.write_into(buf, n)
+
+        return buf
+
     def build_axis(self):
-        return self.build_eth().build_axis()
+        return axis_ep.AXIStreamFrame.from_buffer(self.build_bytes())
 
     def build_eth(self):
-        return self.build_ip().build_eth()
+        buf = self.build_bytes(ip_ep.IP_HDR_LEN)
+        return eth_ep.EthFrame(axis_ep.AXIStreamFrame.from_buffer(buf), self.eth_dest_mac, self.eth_src_mac, self.eth_type)
 
     def build_ip(self):
-        self.build()
-        data = b''
-
-        data += struct.pack('>H', self.udp_source_port)
-        data += struct.pack('>H', self.udp_dest_port)
-        data += struct.pack('>H', self.udp_length)
-        data += struct.pack('>H', self.udp_checksum)
-
-        data += self.payload.data
+        buf = self.build_bytes(0)
 
         return ip_ep.IPFrame(
-                data,
+                axis_ep.AXIStreamFrame.from_buffer(buf),
                 self.eth_dest_mac,
                 self.eth_src_mac,
                 self.eth_type,
@@ -345,11 +371,13 @@ class UDPFrame(object):
 
 
 class UDPFrameSource():
-    def __init__(self):
+    def __init__(self, idle_sleep=False):
         self.active = False
         self.has_logic = False
         self.queue = []
-        self.payload_source = axis_ep.AXIStreamSource()
+        self.payload_source = axis_ep.AXIStreamSource(idle_sleep=idle_sleep)
+        self.idle_sleep = idle_sleep
+        self.sleep = axis_ep.IdleSleep()
         self.header_queue = []
         self.clk = Signal(bool(0))
 
@@ -360,6 +388,7 @@ class UDPFrameSource():
             self.payload_source.send(frame.payload)
         else:
             self.queue.append(frame)
+        self.sleep.notify()
 
     def count(self):
         return len(self.queue)
@@ -429,12 +458,19 @@ class UDPFrameSource():
 
         @instance
         def logic():
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
 
                 if rst:
                     udp_hdr_valid.next = False
                     self.active = False
+                    idle = False
                 else:
                     udp_hdr_valid.next = self.active and (udp_hdr_valid or not pause)
                     if udp_hdr_ready and udp_hdr_valid:
@@ -475,20 +511,32 @@ class UDPFrameSource():
                         self.header_queue.append(frame)
                         self.payload_source.send(frame.payload)
 
+                    idle = not self.active and not self.header_queue and not self.queue
+
         return instances()
 
 
 class UDPFrameSink():
-    def __init__(self):
+    def __init__(self, callback=None, expected=None, maxlen=None):
         self.has_logic = False
-        self.queue = []
+        self.queue = deque()
         self.payload_sink = axis_ep.AXIStreamSink()
-        self.header_queue = []
+        self.header_queue = deque()
         self.sync = Signal(intbv(0))
+        self.scoreboard = axis_ep.FrameScoreboard()
+        if callback is not None or expected is not None or maxlen is not None:
+            self.stream(callback, expected, maxlen)
+
+    def stream(self, callback=None, expected=None, maxlen=None):
+        if maxlen is None:
+            maxlen = axis_ep.stream_queue_len
+        self.scoreboard = axis_ep.FrameScoreboard(callback, expected)
+        self.queue = deque(self.queue, maxlen=maxlen)
+        return self.scoreboard
 
     def recv(self):
         if self.queue:
-            return self.queue.pop(0)
+            return self.queue.popleft()
         return None
 
     def count(self):
@@ -603,9 +651,10 @@ class UDPFrameSink():
                         self.header_queue.append(frame)
 
                     if not self.payload_sink.empty() and self.header_queue:
-                        frame = self.header_queue.pop(0)
+                        frame = self.header_queue.popleft()
                         frame.payload = self.payload_sink.recv()
                         self.queue.append(frame)
+                        self.scoreboard.receive(frame, frame.payload.length())
                         self.sync.next = not self.sync
 
                         if name is not None:
@@ -0,0 +1 @@
+../lib/axis/tb/vvp_build.py
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+
+Copyright (c) 2020 Alex Forencich
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import functools
+import logging
+import os
+from collections import deque
+
+import cocotb
+from cocotb.triggers import RisingEdge, ReadOnly, First
+from cocotb.utils import get_sim_time
+
+
+class WindowedTrace:
+    """
+    Rolling waveform window
+
+    Samples a list of signals (handles or names of dut signals) on every
+    rising edge of clock, or of any of a list of clocks for signals from
+    several clock domains, and keeps the last window samples in memory.
+    Only list the signals needed to debug the test, as every one of them
+    is read on every edge.  Nothing is written until a trigger:
+    trigger() from a scoreboard or test, a watch() condition, or a test
+    failure through the on_failure() decorator.  The window around the
+    trigger, including post samples after it, is then written to a VCD
+    file.  WAVE_WINDOW=<cycles> enables the trace from the environment
+    without the cost of a full WAVES=1 dump.
+    """
+
+    active = []
+
+    def __init__(self, dut, clock, signals, window=1000, post=100, filename=None, max_dumps=4):
+        self.dut = dut
+        self.clocks = list(clock) if isinstance(clock, (list, tuple)) else [clock]
+        self.window = window
+        self.post = post
+        self.max_dumps = max_dumps
+
+        self.log = logging.getLogger("cocotb.tb")
+
+        if filename is None:
+            filename = "%s_window" % dut._name
+        self.filename = filename
+
+        self.signals = [getattr(dut, s) if isinstance(s, str) else s for s in signals]
+        self.widths = [len(s) for s in self.signals]
+
+        self.samples = deque(maxlen=window)
+        self.conditions = []
+        self.dumps = 0
+        self.pending = None
+        self.countdown = 0
+
+        self.active.append(self)
+        self._task = cocotb.fork(self._run())
+
+    @classmethod
+    def from_env(cls, dut, clock, signals, **kwargs):
+        """
+        Create a trace if WAVE_WINDOW is set, otherwise return None
+        """
+        window = int(os.getenv("WAVE_WINDOW", 0))
+        if not window:
+            return None
+        return cls(dut, clock, signals, window=window, post=int(os.getenv("WAVE_WINDOW_POST", window // 10)), **kwargs)
+
+    def watch(self, condition, name=None):
+        """
+        Trigger when condition() returns true on a sampled edge
+        """
+        self.conditions.append((condition, name or getattr(condition, '__name__', 'condition')))
+
+    def trigger(self, reason="trigger"):
+        """
+        Dump the window once post more samples have been taken
+        """
+        if self.pending is None and self.dumps < self.max_dumps:
+            self.log.info("Waveform window triggered: %s", reason)
+            self.pending = reason
+            self.countdown = self.post
+
+    def flush(self, reason=None):
+        """
+        Dump the window immediately
+        """
+        if reason is None:
+            reason = self.pending or "flush"
+        self.pending = None
+        if self.dumps >= self.max_dumps:
+            return None
+        return self.dump(reason)
+
+    def stop(self):
+        self._task.kill()
+        if self in self.active:
+            self.active.remove(self)
+
+    def dump(self, reason):
+        filename = "%s_%d.vcd" % (self.filename, self.dumps)
+        self.dumps += 1
+
+        with open(filename, "w") as f:
+            self.write_vcd(f, reason)
+
+        self.log.info("Wrote %d cycle waveform window to %s (%s)", len(self.samples), filename, reason)
+        return filename
+
+    def write_vcd(self, f, reason):
+        ids = [self._vcd_id(k) for k in range(len(self.signals))]
+
+        f.write("$comment %s $end\n" % reason)
+        f.write("$timescale 1ps $end\n")
+        f.write("$scope module %s $end\n" % self.dut._name)
+        for sig, width, i in zip(self.signals, self.widths, ids):
+            f.write("$var wire %d %s %s $end\n" % (width, i, sig._name))
+        f.write("$upscope $end\n")
+        f.write("$enddefinitions $end\n")
+
+        last = [None]*len(self.signals)
+
+        for t, values in self.samples:
+            f.write("#%d\n" % t)
+            for k, v in enumerate(values):
+                if v != last[k]:
+                    if self.widths[k] == 1:
+                        f.write("%s%s\n" % (v, ids[k]))
+                    else:
+                        f.write("b%s %s\n" % (v, ids[k]))
+                    last[k] = v
+
+    @staticmethod
+    def _vcd_id(k):
+        s = ""
+        k += 1
+        while k:
+            k, r = divmod(k-1, 94)
+            s += chr(33+r)
+        return s
+
+    @staticmethod
+    def _value(handle):
+        v = handle.value
+        return (getattr(v, 'binstr', None) or str(v)).lower()
+
+    async def _run(self):
+        while True:
+            if len(self.clocks) == 1:
+                await RisingEdge(self.clocks[0])
+            else:
+                await First(*[RisingEdge(c) for c in self.clocks])
+            await ReadOnly()
+
+            self.samples.append((get_sim_time('ps'), [self._value(s) for s in self.signals]))
+
+            for condition, name in self.conditions:
+                if condition():
+                    self.trigger(name)
+
+            if self.pending is not None:
+                if self.countdown > 0:
+                    self.countdown -= 1
+                else:
+                    self.flush()
+
+
+def on_failure(test):
+    """
+    Decorator for cocotb test coroutines that flushes all active
+    windowed traces when the test raises
+
+    Traces still active when the test starts were left by an earlier test
+    and are stopped first, so they are never dumped for this failure.
+    """
+    @functools.wraps(test)
+    async def wrapper(*args, **kwargs):
+        for trace in list(WindowedTrace.active):
+            trace.stop()
+        try:
+            return await test(*args, **kwargs)
+        except Exception as e:
+            for trace in list(WindowedTrace.active):
+                trace.flush("failure: %s" % (repr(e)))
+            raise
+        finally:
+            for trace in list(WindowedTrace.active):
+                trace.stop()
+
+    return wrapper
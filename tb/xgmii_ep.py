@@ -24,6 +24,8 @@ THE SOFTWARE.
 
 from myhdl import *
 
+import axis_ep
+
 ETH_PRE = 0x55
 ETH_SFD = 0xD5
 
@@ -42,6 +44,8 @@ XGMII_RES5   = 0xf7
 XGMII_SIG_OS = 0x5c
 
 class XGMIIFrame(object):
+    __slots__ = ('data', 'error', 'ctrl')
+
     def __init__(self, data=b'', error=None, ctrl=None):
         self.data = b''
         self.error = None
@@ -61,9 +65,6 @@ class XGMIIFrame(object):
         f = list(self.data)
         ctrl = []
         error = []
-        d = []
-        c = []
-        i = 0
 
         assert_error = False
         if (type(self.error) is int or type(self.error) is bool) and self.error:
@@ -88,13 +89,7 @@ class XGMIIFrame(object):
                 f[i] = XGMII_ERROR
                 ctrl[i] = 1
 
-        i = 0
-        while len(f) > 0:
-            d.append(f.pop(0))
-            c.append(ctrl[i])
-            i += 1
-
-        return d, c
+        return f, ctrl
 
     def parse(self, d, c):
         if d is None or c is None:
@@ -121,15 +116,18 @@ class XGMIIFrame(object):
 
 
 class XGMIISource(object):
-    def __init__(self, ifg=12, enable_dic=True):
+    def __init__(self, ifg=12, enable_dic=True, idle_sleep=False):
         self.has_logic = False
         self.queue = []
+        self.idle_sleep = idle_sleep
+        self.sleep = axis_ep.IdleSleep()
         self.ifg = ifg
         self.enable_dic = enable_dic
         self.force_offset_start = False
 
     def send(self, frame):
         self.queue.append(XGMIIFrame(frame))
+        self.sleep.notify()
 
     def count(self):
         return len(self.queue)
@@ -163,8 +161,16 @@ class XGMIISource(object):
             ifg_cnt = 0
             deficit_idle_cnt = 0
 
+            idle = False
+
             while True:
-                yield clk.posedge, rst.posedge
+                if idle and self.idle_sleep:
+                    # nothing to send; sleep until send() or reset
+                    yield from self.sleep.wait(clk, rst)
+                else:
+                    yield clk.posedge, rst.posedge
+
+                idle = False
 
                 if rst:
                     frame = None
@@ -236,6 +242,7 @@ class XGMIISource(object):
                         deficit_idle_cnt = 0
                         txd.next = 0x0707070707070707 if bw == 8 else 0x07070707
                         txc.next = 0xff if bw == 8 else 0xf
+                        idle = True
 
         return instances()
 